@@ -0,0 +1,46 @@
+"""
+Aggregation kernels for the visualization tools
+
+Numba is optional: when it is installed the kernels are JIT-compiled (and
+compiled once at import, so no chart pays the compile cost); otherwise the
+same functions fall back to NumPy's bincount.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _pivot_sum_count_loop(yi: np.ndarray, xi: np.ndarray, values: np.ndarray, ny: int, nx: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum and count the non-NaN values falling in each (yi, xi) cell of an ny-by-nx grid."""
+    # A single serial pass: parallel scatter-adds into the same cells would race
+    sums = np.zeros((ny, nx))
+    counts = np.zeros((ny, nx), np.int64)
+    for i in range(len(values)):
+        value = values[i]
+        if value == value:  # skip NaN, as pandas aggregations do
+            sums[yi[i], xi[i]] += value
+            counts[yi[i], xi[i]] += 1
+    return sums, counts
+
+def _pivot_sum_count_numpy(yi: np.ndarray, xi: np.ndarray, values: np.ndarray, ny: int, nx: int) -> Tuple[np.ndarray, np.ndarray]:
+    """NumPy fallback for _pivot_sum_count_loop."""
+    cells = yi * nx + xi
+    present = ~np.isnan(values)
+    if not present.all():
+        cells, values = cells[present], values[present]
+    sums = np.bincount(cells, weights=values, minlength=ny * nx).reshape(ny, nx)
+    counts = np.bincount(cells, minlength=ny * nx).reshape(ny, nx)
+    return sums, counts
+
+if njit is not None:
+    _pivot_sum_count_loop = njit(cache=True, nogil=True)(_pivot_sum_count_loop)
+    # Compile now for the argument types the pivot passes in
+    _pivot_sum_count_loop(np.zeros(1, np.intp), np.zeros(1, np.intp), np.zeros(1), 1, 1)
+    pivot_sum_count = _pivot_sum_count_loop
+else:
+    pivot_sum_count = _pivot_sum_count_numpy
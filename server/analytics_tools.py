@@ -842,8 +842,8 @@ class AnalyticsService:
 
 
 # Define MCP tools for analytics
-def get_analytics_tools() -> List[Tool]:
-    """Return list of analytics tools for MCP server."""
+def _build_analytics_tools() -> List[Tool]:
+    """Build the analytics tool definitions (called once at import)."""
     return [
         Tool(
             name="user_segmentation",
@@ -907,6 +907,12 @@ def get_analytics_tools() -> List[Tool]:
         )
     ]
 
+ANALYTICS_TOOLS = _build_analytics_tools()
+
+def get_analytics_tools() -> List[Tool]:
+    """Return list of analytics tools for MCP server."""
+    return ANALYTICS_TOOLS
+
 # Create global analytics service instance for backward compatibility
 _analytics_service = None
 
@@ -928,7 +934,4 @@ async def geographic_analysis(analysis_type: str = "overview") -> str:
     return await get_analytics_service().geographic_analysis(analysis_type)
 
 async def product_performance(analysis_type: str = "popularity") -> str:
-    return await get_analytics_service().product_performance(analysis_type)
-
-# Export the tools list for backward compatibility
-ANALYTICS_TOOLS = get_analytics_tools() 
\ No newline at end of file
+    return await get_analytics_service().product_performance(analysis_type)
\ No newline at end of file
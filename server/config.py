@@ -28,6 +28,15 @@ class Config:
     CHART_WIDTH = 800
     CHART_HEIGHT = 600
     CHART_DPI = 100
+    # "matplotlib" renders funnels in-process; "plotly" exports through
+    # Kaleido, which starts a headless browser and is much slower
+    FUNNEL_RENDERER = "matplotlib"
+    # "png" or "jpeg"; JPEG suits gradient-heavy heatmaps, but the annotated,
+    # flat-celled heatmaps drawn here come out larger as JPEG than as PNG
+    HEATMAP_IMAGE_FORMAT = "png"
+    
+    # Cache for results derived from the (read-only) demo database
+    CACHE_DIR = Path(__file__).parent / "cache"
     
     # Supported chart types
     SUPPORTED_CHART_TYPES = [
@@ -118,6 +127,7 @@ class Config:
     def ensure_directories(cls) -> None:
         """Create necessary directories"""
         cls.CHART_OUTPUT_DIR.mkdir(exist_ok=True)
+        cls.CACHE_DIR.mkdir(exist_ok=True)
     
     @classmethod
     def validate_database(cls) -> bool:
@@ -5,70 +5,168 @@ This module provides MCP tools for safe database operations including
 queries, schema inspection, and user behavior analysis.
 """
 
+import hashlib
+import json
 import logging
+import os
 import sqlite3
+import tempfile
+import threading
 import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 from mcp.types import Tool
-from pydantic import BaseModel
 
 from config import Config
 
 logger = logging.getLogger(__name__)
 
-class QueryResult(BaseModel):
-    """Result structure for database queries"""
+# Basic dataset statistics shown by analyze_user_behavior("overview")
+OVERVIEW_QUERY = """
+SELECT 
+    'Total Clicks' as metric, COUNT(*) as value FROM clickstream
+UNION ALL
+SELECT 
+    'Unique Sessions', COUNT(DISTINCT session_id) FROM clickstream
+UNION ALL
+SELECT 
+    'Countries', COUNT(DISTINCT country) FROM clickstream
+UNION ALL
+SELECT 
+    'Product Categories', COUNT(DISTINCT page_1_main_category) 
+    FROM clickstream WHERE page_1_main_category != 'Unknown'
+UNION ALL
+SELECT 
+    'Unique Products', COUNT(DISTINCT page_2_clothing_model) 
+    FROM clickstream WHERE page_2_clothing_model != 'Unknown'
+"""
+
+@dataclass(slots=True)
+class QueryResult:
+    """Result structure for database queries.
+
+    Internal DTO: rows are kept as the tuples returned by sqlite3 rather than
+    being revalidated element-by-element.
+    """
     columns: List[str]
-    data: List[List[Any]]
+    data: List[Tuple[Any, ...]]
     row_count: int
     execution_time_ms: float
 
 class DatabaseConnection:
     """Database connection handler with safety controls"""
     
+    # Compiled statements kept by the shared connection; re-running the same
+    # SQL text (with new parameters) skips the parse/plan step
+    STATEMENT_CACHE_SIZE = 256
+    
+    # Page cache of the shared connection, in KiB
+    PAGE_CACHE_KIB = 65536
+    
     def __init__(self, db_path: Path):
         self.db_path = db_path
+        self._shared: Optional[sqlite3.Connection] = None
+        self._shared_lock = threading.Lock()
+    
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        """Open a new connection to the database"""
+        return sqlite3.connect(self.db_path, **kwargs)
+    
+    def _shared_connection(self) -> sqlite3.Connection:
+        """Return the long-lived connection, opening it on first use. Hold _shared_lock."""
+        if self._shared is None:
+            self._shared = self._connect(check_same_thread=False, cached_statements=self.STATEMENT_CACHE_SIZE)
+            self._shared.execute("PRAGMA query_only=1")
+            # Room for the whole demo database, so warm_cache's pages stay resident
+            self._shared.execute(f"PRAGMA cache_size=-{self.PAGE_CACHE_KIB}")
+        return self._shared
+    
+    def close(self) -> None:
+        """Close the shared connection; it is reopened on next use"""
+        with self._shared_lock:
+            if self._shared is not None:
+                self._shared.close()
+                self._shared = None
     
     def execute_query(self, query: str, params: Optional[Tuple] = None) -> QueryResult:
         """Execute a database query with safety checks and timing"""
+        # Safety check
+        if not self._is_safe_query(query):
+            raise ValueError("Query contains unsafe operations. Only SELECT, WITH, and EXPLAIN are allowed.")
+        
+        return self._run_query(query, params)
+    
+    def _run_query(self, query: str, params: Optional[Tuple] = None) -> QueryResult:
+        """Run an already validated query on the shared connection and time it"""
         start_time = time.time()
         
-        # Safety check
+        try:
+            with self._shared_lock:
+                cursor = self._shared_connection().execute(query, params or ())
+                
+                # Get column names
+                columns = [description[0] for description in cursor.description] if cursor.description else []
+                
+                # Fetch results
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Database query failed: {e}")
+            raise Exception(f"Database error: {str(e)}")
+        
+        execution_time = (time.time() - start_time) * 1000
+        
+        return QueryResult(
+            columns=columns,
+            data=rows,
+            row_count=len(rows),
+            execution_time_ms=round(execution_time, 2)
+        )
+    
+    def execute_query_one(self, query: str, params: Optional[Tuple] = None) -> Optional[Tuple[Any, ...]]:
+        """Execute a query and return only its first row (None if empty)"""
         if not self._is_safe_query(query):
             raise ValueError("Query contains unsafe operations. Only SELECT, WITH, and EXPLAIN are allowed.")
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            # Get column names
-            columns = [description[0] for description in cursor.description] if cursor.description else []
-            
-            # Fetch results
-            rows = cursor.fetchall()
-            
-            conn.close()
-            
-            execution_time = (time.time() - start_time) * 1000
-            
-            return QueryResult(
-                columns=columns,
-                data=rows,
-                row_count=len(rows),
-                execution_time_ms=round(execution_time, 2)
-            )
-            
+            with self._shared_lock:
+                cursor = self._shared_connection().execute(query, params or ())
+                try:
+                    return cursor.fetchone()
+                finally:
+                    # Reset the statement so it doesn't hold a read lock
+                    cursor.close()
         except Exception as e:
             logger.error(f"Database query failed: {e}")
             raise Exception(f"Database error: {str(e)}")
     
+    def iter_query(self, query: str, params: Optional[Tuple] = None, chunk: int = 1000) -> Tuple[List[str], Iterator[Tuple[Any, ...]]]:
+        """Execute a query on the shared connection and iterate its rows.
+        
+        Rows are read in fetchmany() batches while the lock is held and
+        yielded after it is released, so a caller that stops iterating early
+        never leaves the shared connection locked.
+        """
+        if not self._is_safe_query(query):
+            raise ValueError("Query contains unsafe operations. Only SELECT, WITH, and EXPLAIN are allowed.")
+        
+        try:
+            with self._shared_lock:
+                cursor = self._shared_connection().execute(query, params or ())
+                columns = [description[0] for description in cursor.description] if cursor.description else []
+                batches = []
+                while True:
+                    batch = cursor.fetchmany(chunk)
+                    if not batch:
+                        break
+                    batches.append(batch)
+        except Exception as e:
+            logger.error(f"Database query failed: {e}")
+            raise Exception(f"Database error: {str(e)}")
+        
+        return columns, (row for batch in batches for row in batch)
+    
     def _is_safe_query(self, query: str) -> bool:
         """Check if query is safe (read-only operations only)"""
         query_upper = query.upper().strip()
@@ -94,7 +192,7 @@ class DatabaseConnection:
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """Get detailed information about a table"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             # Get table schema
@@ -134,6 +232,20 @@ class DatabaseConnection:
             logger.error(f"Failed to get table info for {table_name}: {e}")
             raise Exception(f"Table info error: {str(e)}")
 
+    def warm_cache(self, stop: Optional[threading.Event] = None) -> None:
+        """Run the overview and popular analysis queries once on the shared connection.
+        
+        analyze_user_behavior runs them on that same connection, so this
+        leaves their pages in its page cache and their compiled statements in
+        its statement cache. The lock is taken per query, so a request never
+        waits behind the whole warm-up, and setting stop ends it between queries.
+        """
+        for query in [OVERVIEW_QUERY, *Config.POPULAR_QUERIES.values()]:
+            if stop is not None and stop.is_set():
+                return
+            with self._shared_lock:
+                self._shared_connection().execute(query).fetchall()
+
 class DatabaseService:
     """Service class for database operations with lazy initialization"""
     
@@ -156,14 +268,23 @@ class DatabaseService:
     
     def reset_connection(self) -> None:
         """Reset connection for testing or config changes"""
+        if self._connection is not None:
+            self._connection.close()
         self._connection = None
 
 class DatabaseTools:
     """Collection of database tools for the MCP server."""
     
+    # Rows shown per analysis; any further rows are only counted
+    MAX_ANALYSIS_ROWS = 200
+    
     def __init__(self):
         self.db_service = DatabaseService.get_instance()
     
+    def _format_rows(self, rows: List[Tuple[Any, ...]], width: int = 15) -> List[str]:
+        """Render rows as fixed-width, pipe-separated table lines"""
+        return [" | ".join(f"{str(val):{width}}" for val in row) for row in rows]
+    
     def _format_query_result(self, result: QueryResult) -> str:
         """Format query results for display"""
         output = []
@@ -183,9 +304,7 @@ class DatabaseTools:
             output.append("-" * len(header))
             
             # Add data rows (limit to 50 for readability)
-            for i, row in enumerate(result.data[:50]):
-                formatted_row = " | ".join(f"{str(val):15}" for val in row)
-                output.append(formatted_row)
+            output.extend(self._format_rows(result.data[:50]))
             
             if result.row_count > 50:
                 output.append(f"... ({result.row_count - 50} more rows)")
@@ -291,8 +410,9 @@ class DatabaseTools:
                 return f"Error: Table '{table_name}' not found"
             
             # Get sample data
-            query = f"SELECT * FROM {table_name} LIMIT {limit}"
-            result = db_connection.execute_query(query)
+            # The limit is a parameter so every limit reuses one cached statement
+            query = f"SELECT * FROM {table_name} LIMIT ?"
+            result = db_connection.execute_query(query, (limit,))
             
             if result.row_count == 0:
                 return f"Table '{table_name}' exists but contains no data"
@@ -313,6 +433,47 @@ class DatabaseTools:
             logger.error(f"Sample data retrieval failed: {e}")
             return f"Error getting sample data: {str(e)}"
 
+    def _get_overview_rows(self, db_connection: DatabaseConnection, query: str) -> Tuple[List[str], List[Any], bool]:
+        """Return overview columns, rows and whether they came from the on-disk cache.
+        
+        Cached rows are reused only for the same query against the same,
+        unchanged database file.
+        """
+        cache_path = Config.CACHE_DIR / "overview.json"
+        db_path = Path(db_connection.db_path).resolve()
+        cache_key = hashlib.blake2b(
+            f"{db_path}\0{os.stat(db_path).st_mtime_ns}\0{query}".encode()
+        ).hexdigest()
+        
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get("key") == cache_key:
+                return cached["columns"], cached["rows"], True
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        
+        columns, row_iter = db_connection.iter_query(query)
+        rows = list(row_iter)
+        
+        # Write to a temporary file and swap it in, so readers never see a partial file
+        tmp_path = None
+        try:
+            Config.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=Config.CACHE_DIR, suffix=".tmp", delete=False) as f:
+                tmp_path = f.name
+                json.dump({"key": cache_key, "columns": columns, "rows": rows}, f)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write overview cache: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+        
+        return columns, rows, False
+
     async def analyze_user_behavior(self, analysis_type: str = "overview") -> str:
         """
         Run pre-built analytics queries for common user behavior insights.
@@ -334,47 +495,44 @@ class DatabaseTools:
             
             if analysis_type == "overview":
                 # Basic overview statistics
-                query = """
-                SELECT 
-                    'Total Clicks' as metric, COUNT(*) as value FROM clickstream
-                UNION ALL
-                SELECT 
-                    'Unique Sessions', COUNT(DISTINCT session_id) FROM clickstream
-                UNION ALL
-                SELECT 
-                    'Countries', COUNT(DISTINCT country) FROM clickstream
-                UNION ALL
-                SELECT 
-                    'Product Categories', COUNT(DISTINCT page_1_main_category) 
-                    FROM clickstream WHERE page_1_main_category != 'Unknown'
-                UNION ALL
-                SELECT 
-                    'Unique Products', COUNT(DISTINCT page_2_clothing_model) 
-                    FROM clickstream WHERE page_2_clothing_model != 'Unknown'
-                """
+                query = OVERVIEW_QUERY
                 title = "E-commerce Dataset Overview"
             else:
                 query = Config.POPULAR_QUERIES[analysis_type]
                 title = f"User Behavior Analysis: {analysis_type.replace('_', ' ').title()}"
             
-            result = db_connection.execute_query(query)
+            start_time = time.time()
+            from_cache = False
+            if analysis_type == "overview":
+                columns, rows, from_cache = self._get_overview_rows(db_connection, query)
+            else:
+                columns, rows = db_connection.iter_query(query)
+            
+            # Count the rows, keeping only the displayed ones
+            shown_rows = []
+            row_count = 0
+            for row in rows:
+                row_count += 1
+                if row_count <= self.MAX_ANALYSIS_ROWS:
+                    shown_rows.append(row)
+            execution_time = round((time.time() - start_time) * 1000, 2)
             
             # Format results
             output = [title]
             output.append("=" * len(title))
-            output.append(f"Generated: {result.execution_time_ms}ms\n")
+            output.append(f"Generated: {execution_time}ms{' (cached)' if from_cache else ''}\n")
             
-            if result.row_count == 0:
+            if row_count == 0:
                 output.append("No data found for this analysis.")
             else:
                 # Create formatted table
-                header = " | ".join(f"{col:15}" for col in result.columns)
+                header = " | ".join(f"{col:15}" for col in columns)
                 output.append(header)
                 output.append("-" * len(header))
+                output.extend(self._format_rows(shown_rows))
                 
-                for row in result.data:
-                    formatted_row = " | ".join(f"{str(val):15}" for val in row)
-                    output.append(formatted_row)
+                if row_count > self.MAX_ANALYSIS_ROWS:
+                    output.append(f"... ({row_count - self.MAX_ANALYSIS_ROWS} more rows)")
             
             return "\n".join(output)
             
@@ -383,8 +541,8 @@ class DatabaseTools:
             return f"Error in analysis: {str(e)}"
 
 # Define MCP tools
-def get_database_tools() -> List[Tool]:
-    """Return list of database tools for MCP server."""
+def _build_database_tools() -> List[Tool]:
+    """Build the database tool definitions (called once at import)."""
     return [
         Tool(
             name="query_database",
@@ -451,6 +609,12 @@ def get_database_tools() -> List[Tool]:
         )
     ]
 
+DATABASE_TOOLS = _build_database_tools()
+
+def get_database_tools() -> List[Tool]:
+    """Return list of database tools for MCP server."""
+    return DATABASE_TOOLS
+
 # Create global database tools instance for backward compatibility
 _database_tools = None
 
@@ -472,7 +636,4 @@ async def get_sample_data(table_name: str, limit: int = 5) -> str:
     return await get_database_service().get_sample_data(table_name, limit)
 
 async def analyze_user_behavior(analysis_type: str = "overview") -> str:
-    return await get_database_service().analyze_user_behavior(analysis_type)
-
-# Export the tools list for backward compatibility
-DATABASE_TOOLS = get_database_tools() 
\ No newline at end of file
+    return await get_database_service().analyze_user_behavior(analysis_type)
\ No newline at end of file
@@ -7,7 +7,8 @@ and visualization capabilities for e-commerce user behavior data.
 
 import asyncio
 import logging
-from typing import Any, Sequence
+import threading
+from typing import Any, Optional, Sequence
 import json
 
 from mcp.server.lowlevel import Server
@@ -29,7 +30,7 @@ from mcp.types import (
 # Import our tool modules
 from database_tools import get_database_tools, query_database, get_table_schema, get_sample_data, analyze_user_behavior
 from analytics_tools import get_analytics_tools, user_segmentation, conversion_funnel, geographic_analysis, product_performance
-from visualization_tools import get_visualization_tools, VisualizationTools
+from visualization_tools import get_visualization_tools, shutdown_plotly_executor, VisualizationTools
 from config import Config
 
 # Configure logging
@@ -45,9 +46,15 @@ server = Server("database-analytics-server")
 # Initialize visualization tools instance
 viz_tools = VisualizationTools()
 
-@server.list_resources()
-async def handle_list_resources() -> ListResourcesResult:
-    """List available resources (database schema information)."""
+# Tool definitions are static, so the combined catalog is built once
+_ALL_TOOLS = get_database_tools() + get_analytics_tools() + get_visualization_tools()
+
+# Memoized list responses, built on first request
+_LIST_TOOLS_RESULT: Optional[ListToolsResult] = None
+_LIST_RESOURCES_RESULT: Optional[ListResourcesResult] = None
+
+def _build_resources_result() -> ListResourcesResult:
+    """Build the static resource listing."""
     return ListResourcesResult(
         resources=[
             Resource(
@@ -71,6 +78,14 @@ async def handle_list_resources() -> ListResourcesResult:
         ]
     )
 
+@server.list_resources()
+async def handle_list_resources() -> ListResourcesResult:
+    """List available resources (database schema information)."""
+    global _LIST_RESOURCES_RESULT
+    if _LIST_RESOURCES_RESULT is None:
+        _LIST_RESOURCES_RESULT = _build_resources_result()
+    return _LIST_RESOURCES_RESULT
+
 @server.read_resource()
 async def handle_read_resource(request: ReadResourceRequest) -> ReadResourceResult:
     """Handle resource reading requests."""
@@ -112,19 +127,11 @@ async def handle_read_resource(request: ReadResourceRequest) -> ReadResourceResu
 @server.list_tools()
 async def handle_list_tools() -> ListToolsResult:
     """List all available tools."""
-    all_tools = []
-    
-    # Add database tools
-    all_tools.extend(get_database_tools())
-    
-    # Add analytics tools
-    all_tools.extend(get_analytics_tools())
-    
-    # Add visualization tools
-    all_tools.extend(get_visualization_tools())
-    
-    logger.info(f"Listing {len(all_tools)} available tools")
-    return ListToolsResult(tools=all_tools)
+    global _LIST_TOOLS_RESULT
+    if _LIST_TOOLS_RESULT is None:
+        _LIST_TOOLS_RESULT = ListToolsResult(tools=_ALL_TOOLS)
+    logger.info(f"Listing {len(_LIST_TOOLS_RESULT.tools)} available tools")
+    return _LIST_TOOLS_RESULT
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict) -> list:
@@ -220,16 +227,27 @@ async def handle_call_tool(name: str, arguments: dict) -> list:
         logger.error(f"Tool execution failed: {e}")
         return [TextContent(type="text", text=f"Error executing tool '{name}': {str(e)}")]
 
+async def warm_database_cache(db_connection, stop: threading.Event) -> None:
+    """Warm the shared connection's caches off the event loop; set stop to end it early."""
+    try:
+        await asyncio.to_thread(db_connection.warm_cache, stop)
+        if not stop.is_set():
+            logger.info("Database connection warmed")
+    except Exception as e:
+        logger.warning(f"Database cache warm-up failed: {e}")
+
 async def main():
     """Main entry point for the MCP server."""
     logger.info("Starting Database Analytics MCP Server...")
     logger.info(f"Database path: {Config.DATABASE_PATH}")
     
     # Count available tools
-    total_tools = len(get_database_tools() + get_analytics_tools() + get_visualization_tools())
+    total_tools = len(_ALL_TOOLS)
     logger.info(f"Available tools: {total_tools}")
     
     # Verify database connection
+    warmup_task: Optional[asyncio.Task] = None
+    warmup_stop = threading.Event()
     try:
         from database_tools import DatabaseService
         db_service = DatabaseService.get_instance()
@@ -240,6 +258,9 @@ async def main():
         total_records = result.data[0][0] if result.data else 0
         logger.info(f"Database connected successfully - {total_records:,} records available")
         
+        # Run the analysis queries once in the background so their first real run is warm
+        warmup_task = asyncio.create_task(warm_database_cache(db_connection, warmup_stop))
+        
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         logger.error("Server may not function properly without database access")
@@ -250,22 +271,31 @@ async def main():
     from mcp.server.lowlevel import NotificationOptions
     
     # Run the server using stdio transport
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        logger.info("MCP Server is running and ready for connections")
-        logger.info("Server capabilities: resources=True, tools=True, prompts=False")
-        
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="database-analytics-server",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            logger.info("MCP Server is running and ready for connections")
+            logger.info("Server capabilities: resources=True, tools=True, prompts=False")
+            
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="database-analytics-server",
+                    server_version="1.0.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        # Cancelling the task only stops awaiting the worker thread; the
+        # event is what makes warm_cache return before its next statement
+        warmup_stop.set()
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        viz_tools.close()
+        shutdown_plotly_executor()
 
 if __name__ == "__main__":
     """
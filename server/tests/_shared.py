@@ -0,0 +1,74 @@
+"""
+Shared test resources
+=====================
+
+Expensive setup (database connection, tool catalog) and MCP dispatch helpers
+used by the pytest fixtures in conftest.py, the test runner, and the
+standalone test scripts.
+"""
+
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from mcp.types import CallToolRequest, CallToolResult, Tool
+
+from config import Config
+from database_tools import DatabaseConnection, DatabaseService, get_database_tools
+from analytics_tools import get_analytics_tools
+from visualization_tools import get_visualization_tools
+from main import server
+
+ToolsRegistry = Tuple[List[Tool], List[Tool], List[Tool]]
+
+def get_db_connection() -> DatabaseConnection:
+    """Return the process-wide database connection"""
+    return DatabaseService.get_instance().get_connection()
+
+def get_tools_registry() -> ToolsRegistry:
+    """Return the (database, analytics, visualization) tool lists"""
+    return get_database_tools(), get_analytics_tools(), get_visualization_tools()
+
+async def call_tool(request: CallToolRequest) -> CallToolResult:
+    """Dispatch a tools/call request through the server's registered MCP handler"""
+    response = await server.request_handlers[CallToolRequest](request)
+    return response.root
+
+# Cross-run result cache used by debug_caching (enable with MCP_TEST_CACHE=1);
+# per-user, and JSON rather than pickle so loading it can never run code
+DEBUG_CACHE_PATH = Path.home() / ".cache" / "mcp_viz_cache.json"
+
+def debug_caching(func: Callable[[CallToolRequest], Awaitable[CallToolResult]]) -> Callable[[CallToolRequest], Awaitable[CallToolResult]]:
+    """Persist a request handler's results across runs when MCP_TEST_CACHE=1.
+    
+    Development aid for iterating on slow tests: results are keyed on the
+    request JSON and the database's mtime, so clear DEBUG_CACHE_PATH after
+    changing the code under test.
+    """
+    @functools.wraps(func)
+    async def wrapper(request: CallToolRequest) -> CallToolResult:
+        if os.environ.get("MCP_TEST_CACHE") != "1":
+            return await func(request)
+        
+        db_mtime = os.stat(Config.DATABASE_PATH).st_mtime_ns
+        key = hashlib.sha1(f"{db_mtime}:{request.model_dump_json()}".encode()).hexdigest()
+        cache: Dict[str, Any] = {}
+        try:
+            cache = json.loads(DEBUG_CACHE_PATH.read_text())
+        except (OSError, ValueError):
+            pass
+        if not isinstance(cache, dict):
+            cache = {}
+        if key in cache:
+            return CallToolResult.model_validate(cache[key])
+        
+        result = await func(request)
+        cache[key] = result.model_dump(mode="json")
+        DEBUG_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        DEBUG_CACHE_PATH.write_text(json.dumps(cache))
+        return result
+    
+    return wrapper
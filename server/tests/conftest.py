@@ -0,0 +1,35 @@
+"""
+pytest configuration: session-scoped fixtures shared by all test modules
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add server directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database_tools import DatabaseConnection
+from main import viz_tools
+from tests._shared import ToolsRegistry, get_db_connection, get_tools_registry
+
+def pytest_sessionstart(session):
+    """Open and warm the long-lived database connections while pytest is still collecting.
+    
+    Both are reused by the tests: the database service's shared connection,
+    and the visualization tools' per-thread connection (tests run on this,
+    the main, thread).
+    """
+    get_db_connection().execute_query_one("SELECT COUNT(*) FROM clickstream")
+    viz_tools._connection().execute("SELECT COUNT(*) FROM clickstream").fetchone()
+
+@pytest.fixture(scope="session")
+def db_connection() -> DatabaseConnection:
+    """Database connection shared by every test in the session"""
+    return get_db_connection()
+
+@pytest.fixture(scope="session")
+def tools_registry() -> ToolsRegistry:
+    """Tool catalog built once per test session"""
+    return get_tools_registry()
@@ -3,19 +3,28 @@
 MCP Database Analytics Server - Test Runner
 ===========================================
 
-This script runs all tests for the MCP Database Analytics Server in sequence
+This script runs all tests for the MCP Database Analytics Server concurrently
 and provides a comprehensive report of the results.
 
 Usage:
-    python run_all_tests.py
+    python run_all_tests.py [--fail-fast]
     python -m tests.run_all_tests
+
+The same tests can also be run with pytest from the server directory
+(``python -m pytest``), which shares setup through session fixtures in
+conftest.py.
 """
 
+import argparse
 import asyncio
+import contextvars
+import functools
+import io
+import json
 import sys
 import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # Add server directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -24,9 +33,42 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from test_initialization import test_server_initialization
 from test_mcp_protocol import test_mcp_protocol_functionality  
 from test_visualization import test_visualization_functionality
+from test_aggregation import run_aggregation_checks
+from tests._shared import get_db_connection, get_tools_registry
+
+# Report separators
+_SEP_EQ = "=" * 60
+_SEP_DASH = "-" * 60
+
+# Seconds before a hung test is abandoned and reported as failed
+TEST_TIMEOUT = 120
+
+# Per-test duration history, used to start the slowest tests first
+TIMINGS_PATH = Path.home() / ".cache" / "mcp_tests_timings.json"
+
+# Weight of the latest run in each test's moving-average duration
+TIMING_EMA_WEIGHT = 0.3
+
+# Output buffer for the test running in the current task, if any
+_test_output: contextvars.ContextVar[Optional[io.StringIO]] = contextvars.ContextVar("_test_output", default=None)
+
+class _TaskStdout:
+    """stdout proxy that routes writes into the current test's buffer"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text: str) -> int:
+        buffer = _test_output.get()
+        return (buffer or self._stream).write(text)
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
 
 class TestResult:
     """Container for test results"""
+    __slots__ = ("name", "success", "duration", "error")
+    
     def __init__(self, name: str, success: bool, duration: float, error: str = None):
         self.name = name
         self.success = success
@@ -36,105 +78,201 @@ class TestResult:
 class TestRunner:
     """Test runner for MCP server tests"""
     
-    def __init__(self):
+    def __init__(self, fail_fast: bool = False):
         self.results: List[TestResult] = []
+        self.fail_fast = fail_fast
+        self.timings = self._load_timings()
+    
+    @staticmethod
+    def _load_timings() -> Dict[str, float]:
+        """Load average test durations from previous runs"""
+        try:
+            timings = json.loads(TIMINGS_PATH.read_text())
+        except (OSError, ValueError):
+            return {}
+        # A hand-edited or foreign file must not break scheduling; ignore it unless
+        # it is the {test name: seconds} mapping _save_timings writes
+        if not isinstance(timings, dict) or not all(
+            isinstance(duration, (int, float)) and not isinstance(duration, bool)
+            for duration in timings.values()
+        ):
+            return {}
+        return {name: float(duration) for name, duration in timings.items()}
+    
+    def _save_timings(self):
+        """Fold this run's durations into the stored moving averages"""
+        for result in self.results:
+            previous = self.timings.get(result.name)
+            self.timings[result.name] = (
+                result.duration if previous is None
+                else (1 - TIMING_EMA_WEIGHT) * previous + TIMING_EMA_WEIGHT * result.duration
+            )
+        try:
+            TIMINGS_PATH.parent.mkdir(parents=True, exist_ok=True)
+            TIMINGS_PATH.write_text(json.dumps(self.timings, indent=2))
+        except OSError:
+            pass  # Timing history is only an optimization
     
     async def run_test(self, test_func, test_name: str) -> TestResult:
         """Run a single test function and capture results"""
-        print(f"\n{'='*60}")
+        # Buffer this test's output so concurrent tests don't interleave
+        buffer = io.StringIO()
+        _test_output.set(buffer)
+        try:
+            return await self._run_test(test_func, test_name)
+        finally:
+            _test_output.set(None)
+            sys.stdout.write(buffer.getvalue())
+            # Show each finished test right away; stdout isn't line buffered
+            sys.stdout.flush()
+    
+    async def _run_test(self, test_func, test_name: str) -> TestResult:
+        print(f"\n{_SEP_EQ}")
         print(f"Running: {test_name}")
-        print(f"{'='*60}")
+        print(f"{_SEP_EQ}")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
-            success = await test_func()
-            duration = time.time() - start_time
+            await asyncio.wait_for(test_func(), timeout=TEST_TIMEOUT)
+            duration = time.perf_counter() - start_time
             
-            if success:
-                print(f"✅ {test_name} PASSED ({duration:.2f}s)")
-                return TestResult(test_name, True, duration)
-            else:
-                print(f"❌ {test_name} FAILED ({duration:.2f}s)")
-                return TestResult(test_name, False, duration, "Test returned False")
-                
+            print(f"✅ {test_name} PASSED ({duration:.2f}s)")
+            return TestResult(test_name, True, duration)
+        
+        except asyncio.TimeoutError:
+            duration = time.perf_counter() - start_time
+            print(f"❌ {test_name} TIMED OUT ({duration:.2f}s)")
+            return TestResult(test_name, False, duration, f"Timed out after {TEST_TIMEOUT}s")
+        
         except Exception as e:
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             print(f"❌ {test_name} FAILED ({duration:.2f}s)")
-            print(f"Error: {str(e)}")
-            return TestResult(test_name, False, duration, str(e))
+            print(f"Error: {e!r}")
+            return TestResult(test_name, False, duration, repr(e))
     
     async def run_all_tests(self) -> bool:
         """Run all tests and return overall success"""
         print("🧪 MCP Database Analytics Server - Test Suite")
-        print("=" * 60)
+        print(_SEP_EQ)
         print(f"Python: {sys.version}")
         print(f"Test directory: {Path(__file__).parent}")
         print(f"Server directory: {Path(__file__).parent.parent}")
         
+        # Expensive setup is done once and shared, like the pytest session fixtures
+        db_connection = get_db_connection()
+        tools_registry = get_tools_registry()
+        
         # Define tests to run
         tests = [
-            (test_server_initialization, "Server Initialization"),
-            (test_mcp_protocol_functionality, "MCP Protocol Functionality"),
+            (functools.partial(test_server_initialization, db_connection, tools_registry), "Server Initialization"),
+            (functools.partial(test_mcp_protocol_functionality, tools_registry), "MCP Protocol Functionality"),
             (test_visualization_functionality, "Visualization Functionality"),
+            (run_aggregation_checks, "Aggregation Equivalence"),
         ]
         
-        # Run all tests
-        for test_func, test_name in tests:
-            result = await self.run_test(test_func, test_name)
-            self.results.append(result)
+        # Start the historically slowest tests first so they overlap the most
+        # with the faster ones (longest-processing-time scheduling)
+        tests.sort(key=lambda test: -self.timings.get(test[1], 0.0))
+        
+        # Run all tests concurrently; they are independent of each other and
+        # share the session's connections, so there is nothing to ration
+        if self.fail_fast:
+            await self._run_until_failure(tests)
+        else:
+            results = await asyncio.gather(*(self.run_test(test_func, test_name) for test_func, test_name in tests))
+            self.results.extend(results)
         
         # Generate final report
         self.print_final_report()
+        self._save_timings()
         
         # Return overall success
         return all(result.success for result in self.results)
     
+    async def _run_until_failure(self, tests) -> None:
+        """Run tests concurrently, cancelling the remaining ones at the first failure"""
+        tasks = [asyncio.create_task(self.run_test(test_func, test_name)) for test_func, test_name in tests]
+        
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            self.results.append(result)
+            if not result.success:
+                for task in tasks:
+                    task.cancel()
+                break
+        
+        # Let cancellations settle, keeping any results that finished meanwhile
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for task in tasks:
+            if not task.cancelled() and task.result() not in self.results:
+                self.results.append(task.result())
+    
     def print_final_report(self):
         """Print comprehensive test report"""
-        print(f"\n{'='*60}")
-        print("TEST SUMMARY REPORT")
-        print(f"{'='*60}")
+        # Build the whole report first and emit it with a single write
+        lines = []
+        lines.append(f"\n{_SEP_EQ}")
+        lines.append("TEST SUMMARY REPORT")
+        lines.append(f"{_SEP_EQ}")
         
         total_tests = len(self.results)
         passed_tests = sum(1 for r in self.results if r.success)
         failed_tests = total_tests - passed_tests
         total_duration = sum(r.duration for r in self.results)
         
-        print(f"Total Tests:     {total_tests}")
-        print(f"Passed:          {passed_tests} ✅")
-        print(f"Failed:          {failed_tests} ❌")
-        print(f"Success Rate:    {(passed_tests/total_tests)*100:.1f}%")
-        print(f"Total Duration:  {total_duration:.2f}s")
+        lines.append(f"Total Tests:     {total_tests}")
+        lines.append(f"Passed:          {passed_tests} ✅")
+        lines.append(f"Failed:          {failed_tests} ❌")
+        lines.append(f"Success Rate:    {(passed_tests/total_tests)*100:.1f}%")
+        lines.append(f"Total Duration:  {total_duration:.2f}s")
         
-        print(f"\nDETAILED RESULTS:")
-        print("-" * 60)
+        lines.append(f"\nDETAILED RESULTS:")
+        lines.append(_SEP_DASH)
         
         for result in self.results:
             status = "✅ PASS" if result.success else "❌ FAIL"
-            print(f"{result.name:<30} {status:<8} {result.duration:>6.2f}s")
+            lines.append(f"{result.name:<30} {status:<8} {result.duration:>6.2f}s")
             if result.error and not result.success:
-                print(f"    Error: {result.error}")
+                lines.append(f"    Error: {result.error}")
         
         if failed_tests == 0:
-            print(f"\n🎉 ALL TESTS PASSED! Server is ready for production.")
+            lines.append(f"\n🎉 ALL TESTS PASSED! Server is ready for production.")
         else:
-            print(f"\n⚠️  {failed_tests} test(s) failed. Please review the errors above.")
+            lines.append(f"\n⚠️  {failed_tests} test(s) failed. Please review the errors above.")
         
-        print(f"\nNext Steps:")
+        lines.append(f"\nNext Steps:")
         if failed_tests == 0:
-            print("  ✅ Server testing complete")
-            print("  🔄 Ready for MCP client implementation")
-            print("  🚀 Ready for demo script development")
+            lines.append("  ✅ Server testing complete")
+            lines.append("  🔄 Ready for MCP client implementation")
+            lines.append("  🚀 Ready for demo script development")
         else:
-            print("  🔧 Fix failing tests")
-            print("  🔄 Re-run test suite")
-            print("  📋 Review error messages above")
+            lines.append("  🔧 Fix failing tests")
+            lines.append("  🔄 Re-run test suite")
+            lines.append("  📋 Review error messages above")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
 
 async def main():
     """Main entry point for test runner"""
-    runner = TestRunner()
+    # Output is written in whole blocks (flushed once per test), so per-line
+    # flushing is wasted work
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False)
+    parser = argparse.ArgumentParser(description="Run the MCP server test suite")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first failing test and cancel the rest")
+    args = parser.parse_args()
+    
+    sys.stdout = _TaskStdout(sys.stdout)
+    runner = TestRunner(fail_fast=args.fail_fast)
     success = await runner.run_all_tests()
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
+    # uvloop is optional; when installed it gives a faster event loop
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main()) 
\ No newline at end of file
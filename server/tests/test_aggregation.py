@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test script to validate the visualization aggregation fast paths
+
+_group_reduce, _dense_pivot and the SQL pushdown in _aggregate_in_sql each
+replace a pandas groupby; these checks compare them against groupby on a
+frame with null keys, NaN values and a group whose values are all null.
+"""
+
+import asyncio
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add server directory to path (go up one level from tests folder)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from visualization_tools import VisualizationTools, _dense_pivot, _group_reduce
+
+AGGREGATIONS = ["count", "sum", "avg", "max", "min"]
+PIVOT_AGGREGATIONS = ["count", "sum", "avg"]  # what create_heatmap offers
+VALUE_COLUMNS = ["price", "clicks"]  # float with NaN, int
+TRUNCATION_LIMITS = [1, 3, 5]
+DTYPE_CASES = [
+    # Numeric x with a NULL first row: pandas reads x as float64 and plots every row
+    ("SELECT NULL AS x, 1 AS y UNION ALL SELECT 2, 5 UNION ALL SELECT 2, 7 UNION ALL SELECT 3, 1", 4),
+    # Text x with a NULL first row is still grouped (the NULL key dropped)
+    ("SELECT NULL AS x, 1 AS y UNION ALL SELECT 'a', 5 UNION ALL SELECT 'a', 7 UNION ALL SELECT 'b', 1", 2),
+]
+
+def make_frame(rows: int = 2000) -> pd.DataFrame:
+    """Keys with nulls, float values with NaN, and a group ('e') with only null prices"""
+    rng = np.random.default_rng(0)
+    country = rng.choice(["a", "b", "c", "d", "e", None], rows).astype(object)
+    category = rng.choice(["x", "y", "z", None], rows).astype(object)
+    price = rng.random(rows) * 100
+    price[rng.random(rows) < 0.2] = np.nan
+    price[country == "e"] = np.nan
+    clicks = rng.integers(-50, 50, rows)
+    return pd.DataFrame({"country": country, "category": category, "price": price, "clicks": clicks})
+
+def groupby_reference(df: pd.DataFrame, x_column: str, y_column: str, aggregation: str) -> pd.DataFrame:
+    """create_chart's original pandas aggregation"""
+    grouped = df.groupby(x_column)
+    if aggregation == "count":
+        return grouped.size().reset_index(name=y_column)
+    method = "mean" if aggregation == "avg" else aggregation
+    return getattr(grouped[y_column], method)().reset_index()
+
+@contextlib.contextmanager
+def frame_database(frame: pd.DataFrame):
+    """VisualizationTools reading the frame from a temporary database (table 'clicks')"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "aggregation.db"
+        conn = sqlite3.connect(db_path)
+        frame.to_sql("clicks", conn, index=False)
+        conn.close()
+        tools = VisualizationTools()
+        tools.db_path = db_path
+        try:
+            yield tools
+        finally:
+            tools.close()
+
+# Six groups whose sums, counts, maxima and minima all tie somewhere, listed
+# out of key order so only ORDER BY can put them in order
+TIED_FRAME = pd.DataFrame({
+    "country": ["f", "c", "e", "a", "d", "b", "f", "c", "a", "d"],
+    "clicks": [5, 2, 3, 7, 7, 7, 2, 5, 0, 0],
+})
+
+@pytest.fixture(scope="module")
+def tied_tools():
+    with frame_database(TIED_FRAME) as tools:
+        yield tools
+
+@pytest.fixture(scope="module")
+def frame() -> pd.DataFrame:
+    return make_frame()
+
+@pytest.fixture(scope="module")
+def frame_tools(frame):
+    with frame_database(frame) as tools:
+        yield tools
+
+@pytest.mark.parametrize("aggregation", AGGREGATIONS)
+@pytest.mark.parametrize("y_column", VALUE_COLUMNS)
+def test_group_reduce_matches_groupby(frame, y_column, aggregation):
+    expected = groupby_reference(frame, "country", y_column, aggregation)
+    actual = _group_reduce(frame, "country", y_column, aggregation)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+@pytest.mark.parametrize("aggregation", PIVOT_AGGREGATIONS)
+@pytest.mark.parametrize("value_column", [None] + VALUE_COLUMNS)
+def test_dense_pivot_matches_groupby(frame, value_column, aggregation):
+    # create_heatmap's original groupby/unstack pivot
+    grouped = frame.groupby(["category", "country"])
+    if value_column is None:
+        expected = grouped.size()
+    else:
+        expected = getattr(grouped[value_column], {"avg": "mean"}.get(aggregation, aggregation))()
+    expected = expected.unstack(fill_value=0)
+    actual = _dense_pivot(frame, "category", "country", value_column, aggregation)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+@pytest.mark.parametrize("top_values", [True, False])
+@pytest.mark.parametrize("aggregation", AGGREGATIONS)
+@pytest.mark.parametrize("y_column", VALUE_COLUMNS)
+def test_aggregate_in_sql_matches_groupby(frame, frame_tools, y_column, aggregation, top_values):
+    # A limit above the group count, so nothing is cut and rows come back in key order
+    expected = groupby_reference(frame, "country", y_column, aggregation)
+    actual = frame_tools._aggregate_in_sql(f"SELECT country, {y_column} FROM clicks -- all rows",
+                                           "country", y_column, aggregation, limit=100, top_values=top_values)
+    pd.testing.assert_frame_equal(actual.astype({y_column: float}), expected.astype({y_column: float}))
+
+@pytest.mark.parametrize("limit", TRUNCATION_LIMITS)
+@pytest.mark.parametrize("aggregation", AGGREGATIONS)
+def test_aggregate_in_sql_truncates_ties_by_key(tied_tools, aggregation, limit):
+    # Fewer rows than groups: the top groups by value, ties broken by key
+    # ascending, as pandas' stable descending sort leaves them
+    expected = groupby_reference(TIED_FRAME, "country", "clicks", aggregation)
+    expected = expected.sort_values("clicks", ascending=False, kind="stable").head(limit).reset_index(drop=True)
+    actual = tied_tools._aggregate_in_sql("SELECT country, clicks FROM clicks", "country", "clicks",
+                                          aggregation, limit=limit, top_values=True)
+    pd.testing.assert_frame_equal(actual.astype({"clicks": float}), expected.astype({"clicks": float}))
+
+@pytest.mark.parametrize("limit", TRUNCATION_LIMITS)
+def test_aggregate_in_sql_truncates_in_key_order(tied_tools, limit):
+    # Without top_values the first groups by key are kept
+    expected = groupby_reference(TIED_FRAME, "country", "clicks", "sum").head(limit)
+    actual = tied_tools._aggregate_in_sql("SELECT country, clicks FROM clicks", "country", "clicks",
+                                          "sum", limit=limit, top_values=False)
+    pd.testing.assert_frame_equal(actual.astype({"clicks": float}), expected.astype({"clicks": float}))
+
+@pytest.mark.parametrize("data_query, points", DTYPE_CASES, ids=["numeric_x", "text_x"])
+async def test_create_chart_pushdown_matches_full_frame_dtypes(frame_tools, data_query, points):
+    result = await frame_tools.create_chart(data_query, chart_type="line", x_column="x", y_column="y", cache=False)
+    assert f"- Data points: {points}\n" in result[0].text
+
+async def run_aggregation_checks():
+    """Run every check above with each of its parameter combinations"""
+    try:
+        print("🧮 Testing aggregation fast paths against pandas groupby...")
+        frame = make_frame()
+        checks = 0
+        with frame_database(frame) as frame_tools, frame_database(TIED_FRAME) as tied_tools:
+            for y_column in VALUE_COLUMNS:
+                for aggregation in AGGREGATIONS:
+                    test_group_reduce_matches_groupby(frame, y_column, aggregation)
+                    for top_values in (True, False):
+                        test_aggregate_in_sql_matches_groupby(frame, frame_tools, y_column, aggregation, top_values)
+                    checks += 3
+            for value_column in [None] + VALUE_COLUMNS:
+                for aggregation in PIVOT_AGGREGATIONS:
+                    test_dense_pivot_matches_groupby(frame, value_column, aggregation)
+                    checks += 1
+            for limit in TRUNCATION_LIMITS:
+                for aggregation in AGGREGATIONS:
+                    test_aggregate_in_sql_truncates_ties_by_key(tied_tools, aggregation, limit)
+                test_aggregate_in_sql_truncates_in_key_order(tied_tools, limit)
+                checks += len(AGGREGATIONS) + 1
+            for data_query, points in DTYPE_CASES:
+                await test_create_chart_pushdown_matches_full_frame_dtypes(frame_tools, data_query, points)
+                checks += 1
+        print(f"✅ {checks} aggregation checks passed")
+
+    except Exception as e:
+        print(f"\n❌ Aggregation test failed: {e}")
+        if os.environ.get("MCP_TEST_VERBOSE"):
+            traceback.print_exc()
+        raise
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_aggregation_checks())
+    except Exception:
+        sys.exit(1)
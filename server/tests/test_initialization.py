@@ -4,13 +4,18 @@ Test script to validate MCP server initialization
 """
 
 import asyncio
+import os
 import sys
+import traceback
 from pathlib import Path
 
 # Add server directory to path (go up one level from tests folder)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-async def test_server_initialization():
+from config import Config
+from tests._shared import get_db_connection, get_tools_registry
+
+async def test_server_initialization(db_connection, tools_registry):
     """Test server components initialization"""
     try:
         print("🧪 Testing MCP Server Initialization...")
@@ -21,50 +26,43 @@ async def test_server_initialization():
         import analytics_tools  
         import visualization_tools
         import config
-        from main import get_database_tools, get_analytics_tools, get_visualization_tools
         print("✅ All modules imported successfully")
         
         # Test configuration
         print("⚙️  Testing configuration...")
-        from config import Config
         print(f"   - Database path: {Config.DATABASE_PATH}")
         print(f"   - Database exists: {Config.validate_database()}")
         print(f"   - Chart output dir: {Config.CHART_OUTPUT_DIR}")
         
         # Test database connection
         print("🗄️  Testing database connection...")
-        from database_tools import DatabaseService
-        db_service = DatabaseService.get_instance()
-        db_connection = db_service.get_connection()
         
         # Test simple query
-        result = db_connection.execute_query("SELECT COUNT(*) as total FROM clickstream LIMIT 1")
-        if result.data:
-            total_records = result.data[0][0]
-            print(f"✅ Database connection successful - {total_records:,} records available")
-        else:
-            print("⚠️  Database query returned no results")
+        first_row = db_connection.execute_query_one("SELECT COUNT(*) as total FROM clickstream")
+        assert first_row, "Database query returned no results"
+        total_records = first_row[0]
+        print(f"✅ Database connection successful - {total_records:,} records available")
         
         # Test table structure
-        tables_result = db_connection.execute_query("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' 
+        _, table_rows = db_connection.iter_query("""
+            SELECT name FROM sqlite_master
+            WHERE type='table'
             ORDER BY name
         """)
-        tables = [row[0] for row in tables_result.data]
+        tables = [row[0] for row in table_rows]
         print(f"   - Available tables: {', '.join(tables)}")
+        assert "clickstream" in tables
         
         # Test tools registration
         print("🔧 Testing tools registration...")
-        db_tools = get_database_tools()
-        analytics_tools = get_analytics_tools()
-        viz_tools = get_visualization_tools()
+        db_tools, analytics_tools, viz_tools = tools_registry
         
         total_tools = len(db_tools) + len(analytics_tools) + len(viz_tools)
         print(f"   - Database tools: {len(db_tools)}")
         print(f"   - Analytics tools: {len(analytics_tools)}")
         print(f"   - Visualization tools: {len(viz_tools)}")
         print(f"   - Total tools available: {total_tools}")
+        assert total_tools > 0, "No tools registered"
         
         # Test sample query
         print("🔍 Testing sample analytics query...")
@@ -76,18 +74,18 @@ async def test_server_initialization():
             LIMIT 5
         """)
         print("   - Top 5 countries by sessions:")
-        for row in sample_result.data:
-            print(f"     • {row[0]}: {row[1]:,} sessions")
+        print("\n".join(f"     • {row[0]}: {row[1]:,} sessions" for row in sample_result.data))
         
         print("\n🎉 All tests passed! Server is ready to run.")
-        return True
         
     except Exception as e:
         print(f"\n❌ Test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        if os.environ.get("MCP_TEST_VERBOSE"):
+            traceback.print_exc()
+        raise
 
 if __name__ == "__main__":
-    success = asyncio.run(test_server_initialization())
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+    try:
+        asyncio.run(test_server_initialization(get_db_connection(), get_tools_registry()))
+    except Exception:
+        sys.exit(1) 
\ No newline at end of file
@@ -5,23 +5,63 @@ Test script to validate MCP server protocol functionality
 
 import asyncio
 import json
+import os
+import shutil
+import sqlite3
 import sys
+import traceback
 from pathlib import Path
+from types import SimpleNamespace
 
 # Add server directory to path (go up one level from tests folder)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-async def test_mcp_protocol_functionality():
+from mcp.types import CallToolRequest, CallToolRequestParams
+
+from config import Config
+from database_tools import DatabaseConnection, DatabaseTools
+from main import handle_list_tools, handle_list_resources
+from tests._shared import call_tool, get_tools_registry
+
+# Requests are static and handle_call_tool doesn't mutate them, so build once
+QUERY_REQ = CallToolRequest(
+    method="tools/call",
+    params=CallToolRequestParams(
+        name="query_database",
+        arguments={"query": "SELECT COUNT(*) as total_records FROM clickstream"}
+    )
+)
+ANALYTICS_REQ = CallToolRequest(
+    method="tools/call",
+    params=CallToolRequestParams(
+        name="geographic_analysis",
+        arguments={"analysis_type": "overview"}
+    )
+)
+SAMPLE_REQ = CallToolRequest(
+    method="tools/call",
+    params=CallToolRequestParams(
+        name="get_sample_data",
+        arguments={"table_name": "clickstream", "limit": 3}
+    )
+)
+BEHAVIOR_REQ = CallToolRequest(
+    method="tools/call",
+    params=CallToolRequestParams(
+        name="analyze_user_behavior",
+        arguments={"analysis_type": "overview"}
+    )
+)
+
+async def test_mcp_protocol_functionality(tools_registry):
     """Test MCP server tools by directly calling the handler functions"""
     try:
         print("🧪 Testing MCP Server Tool Functionality...")
         
-        # Import the main server module
-        from main import handle_list_tools, handle_call_tool, handle_list_resources
-        
         # Test 1: List available tools
         print("\n📋 Testing tool listing...")
         tools_result = await handle_list_tools()
+        assert len(tools_result.tools) == sum(len(tools) for tools in tools_registry)
         print(f"✅ Found {len(tools_result.tools)} tools:")
         for tool in tools_result.tools[:5]:  # Show first 5 tools
             print(f"   • {tool.name}: {tool.description}")
@@ -35,71 +75,98 @@ async def test_mcp_protocol_functionality():
         for resource in resources_result.resources:
             print(f"   • {resource.name}: {resource.description}")
         
+        # Tests 3-6: the handlers do their database work synchronously on the
+        # event loop, so the calls run one after another however they're awaited
+        query_result = await call_tool(QUERY_REQ)
+        analytics_result = await call_tool(ANALYTICS_REQ)
+        sample_result = await call_tool(SAMPLE_REQ)
+        behavior_result = await call_tool(BEHAVIOR_REQ)
+        
         # Test 3: Execute a simple database query tool
         print("\n🔍 Testing database query tool...")
-        from mcp.types import CallToolRequest, CallToolRequestParams
-        query_request = CallToolRequest(
-            method="tools/call",
-            params=CallToolRequestParams(
-                name="query_database",
-                arguments={"query": "SELECT COUNT(*) as total_records FROM clickstream"}
-            )
-        )
-        query_result = await handle_call_tool(query_request)
+        assert not query_result.isError
         print("✅ Database query result:")
         print(f"   {query_result.content[0].text}")
         
         # Test 4: Test analytics tool
         print("\n📊 Testing analytics tool...")
-        analytics_request = CallToolRequest(
-            method="tools/call",
-            params=CallToolRequestParams(
-                name="geographic_analysis",
-                arguments={"analysis_type": "overview"}
-            )
-        )
-        analytics_result = await handle_call_tool(analytics_request)
+        assert not analytics_result.isError
         print("✅ Geographic analysis result:")
         result_text = analytics_result.content[0].text
         print(f"   {result_text[:300]}..." if len(result_text) > 300 else f"   {result_text}")
         
         # Test 5: Test get sample data
         print("\n📝 Testing sample data tool...")
-        sample_request = CallToolRequest(
-            method="tools/call",
-            params=CallToolRequestParams(
-                name="get_sample_data",
-                arguments={"table_name": "clickstream", "limit": 3}
-            )
-        )
-        sample_result = await handle_call_tool(sample_request)
+        assert not sample_result.isError
         print("✅ Sample data result:")
         sample_text = sample_result.content[0].text
         print(f"   {sample_text[:400]}..." if len(sample_text) > 400 else f"   {sample_text}")
         
         # Test 6: Test user behavior analysis
         print("\n👥 Testing user behavior analysis...")
-        behavior_request = CallToolRequest(
-            method="tools/call",
-            params=CallToolRequestParams(
-                name="analyze_user_behavior",
-                arguments={"analysis_type": "overview"}
-            )
-        )
-        behavior_result = await handle_call_tool(behavior_request)
+        assert not behavior_result.isError
         print("✅ User behavior analysis result:")
         behavior_text = behavior_result.content[0].text
         print(f"   {behavior_text[:300]}..." if len(behavior_text) > 300 else f"   {behavior_text}")
         
         print("\n🎉 All MCP tool tests passed! Server is fully functional.")
-        return True
         
     except Exception as e:
         print(f"\n❌ MCP tool test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        if os.environ.get("MCP_TEST_VERBOSE"):
+            traceback.print_exc()
+        raise
+
+async def test_overview_cache_hits_until_database_changes(tmp_path, monkeypatch):
+    db_path = tmp_path / "ecommerce.db"
+    shutil.copy(Config.DATABASE_PATH, db_path)
+    monkeypatch.setattr(Config, "CACHE_DIR", tmp_path / "cache")
+    connection = DatabaseConnection(db_path)
+    queries = []
+    iter_query = connection.iter_query
+    def counting_iter_query(query, *args, **kwargs):
+        queries.append(query)
+        return iter_query(query, *args, **kwargs)
+    connection.iter_query = counting_iter_query
+    tools = DatabaseTools()
+    tools.db_service = SimpleNamespace(get_connection=lambda: connection)
+    
+    def table(text):
+        """The result table, without the title and timing lines"""
+        return text.split("\n", 3)[3]
+    
+    try:
+        first = await tools.analyze_user_behavior("overview")
+        assert "(cached)" not in first
+        second = await tools.analyze_user_behavior("overview")
+        assert len(queries) == 1, "second overview should be served from the on-disk cache"
+        assert "(cached)" in second.splitlines()[2]
+        assert table(second) == table(first)
+        
+        # Any write moves the database's mtime, which invalidates the cached overview
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("DELETE FROM clickstream WHERE country = 'Other'")
+        conn.close()
+        stat = os.stat(db_path)
+        os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        third = await tools.analyze_user_behavior("overview")
+        assert len(queries) == 2, "overview should be re-queried after the database changed"
+        assert "(cached)" not in third
+        assert table(third) != table(first)
+        
+        # A corrupt cache file is ignored and replaced
+        (Config.CACHE_DIR / "overview.json").write_text("{not json")
+        fourth = await tools.analyze_user_behavior("overview")
+        assert len(queries) == 3
+        assert table(fourth) == table(third)
+        await tools.analyze_user_behavior("overview")
+        assert len(queries) == 3, "the rewritten cache file should be used again"
+    finally:
+        connection.close()
 
 if __name__ == "__main__":
-    success = asyncio.run(test_mcp_protocol_functionality())
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+    try:
+        asyncio.run(test_mcp_protocol_functionality(get_tools_registry()))
+    except Exception:
+        sys.exit(1) 
\ No newline at end of file
@@ -4,34 +4,56 @@ Test script to validate MCP server visualization functionality
 """
 
 import asyncio
+import base64
+import io
+import os
+import shutil
+import sqlite3
 import sys
+import traceback
 from pathlib import Path
 
 # Add server directory to path (go up one level from tests folder)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+import pytest
+from mcp.types import CallToolRequest, CallToolRequestParams, ImageContent
+from PIL import Image
+
+from config import Config
+from main import viz_tools
+from visualization_tools import VisualizationTools, _downcast_numeric, _fast_bar_png
+from tests._shared import call_tool, debug_caching
+
+# Rendering is the slowest step in the suite; MCP_TEST_CACHE=1 reuses results across runs
+cached_call_tool = debug_caching(call_tool)
+
+# Static request, built once at import
+VIZ_REQ = CallToolRequest(
+    method="tools/call",
+    params=CallToolRequestParams(
+        name="create_chart",
+        arguments={
+            "data_query": "SELECT country, COUNT(*) as sessions FROM clickstream GROUP BY country ORDER BY sessions DESC LIMIT 5",
+            "chart_type": "bar",
+            "title": "Top 5 Countries by Sessions"
+        }
+    )
+)
+
 async def test_visualization_functionality():
     """Test visualization tools"""
     try:
         print("🎨 Testing MCP Server Visualization Functionality...")
         
-        from main import handle_call_tool
-        from mcp.types import CallToolRequest, CallToolRequestParams
-        
         # Test chart creation
         print("\n📊 Testing chart creation...")
-        viz_request = CallToolRequest(
-            method="tools/call",
-            params=CallToolRequestParams(
-                name="create_chart",
-                arguments={
-                    "data_query": "SELECT country, COUNT(*) as sessions FROM clickstream GROUP BY country ORDER BY sessions DESC LIMIT 5",
-                    "chart_type": "bar",
-                    "title": "Top 5 Countries by Sessions"
-                }
-            )
-        )
-        result = await handle_call_tool(viz_request)
+        result = await cached_call_tool(VIZ_REQ)
+        assert not result.isError
         print("✅ Chart creation result:")
         print(f"   Content items: {len(result.content)}")
         for i, content in enumerate(result.content):
@@ -41,16 +63,152 @@ async def test_visualization_functionality():
                     print(f"     Text: {content.text[:100]}...")
                 elif content.type == "image":
                     print(f"     Image: {len(content.data)} bytes")
+        assert any(content.type == "image" for content in result.content), "No chart image returned"
         
         print("\n🎉 Visualization test passed!")
-        return True
         
     except Exception as e:
         print(f"\n❌ Visualization test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        if os.environ.get("MCP_TEST_VERBOSE"):
+            traceback.print_exc()
+        raise
+
+def assert_image(result, mime_type: str = "image/png") -> ImageContent:
+    """Check a create_* result is a summary plus an image that decodes as mime_type"""
+    assert len(result) == 2, result[0].text
+    image = result[1]
+    assert isinstance(image, ImageContent)
+    assert image.mimeType == mime_type
+    with Image.open(io.BytesIO(base64.b64decode(image.data))) as decoded:
+        assert Image.MIME[decoded.format] == mime_type
+        decoded.load()
+    return image
+
+@pytest.mark.parametrize("chart_type, arguments", [
+    # More bars than the PIL fast path draws, so this goes through matplotlib
+    ("bar", {"data_query": "SELECT page_2_clothing_model, price FROM clickstream",
+             "x_column": "page_2_clothing_model", "y_column": "price", "limit": 60}),
+    ("line", {"data_query": "SELECT month, COUNT(*) AS clicks FROM clickstream GROUP BY month",
+              "x_column": "month", "y_column": "clicks"}),
+    ("scatter", {"data_query": "SELECT price, price_2 FROM clickstream LIMIT 500",
+                 "x_column": "price", "y_column": "price_2"}),
+    ("pie", {"data_query": "SELECT page_1_main_category, price FROM clickstream",
+             "x_column": "page_1_main_category", "y_column": "price"}),
+])
+async def test_create_chart_renderers(chart_type, arguments):
+    assert_image(await viz_tools.create_chart(chart_type=chart_type, cache=False, **arguments))
+
+@pytest.mark.parametrize("chart_type", ["bar", "line"])
+async def test_create_chart_long_labels(chart_type):
+    # 90-character labels leave the PIL bar layout no plot area, so bars fall back to matplotlib
+    query = ("SELECT country || ' ' || replace(hex(zeroblob(45)), '0', 'W') AS label, COUNT(*) AS sessions "
+             "FROM clickstream GROUP BY country LIMIT 5")
+    assert _fast_bar_png(["W" * 90] * 5, [1, 2, 3, 4, 5], "Long labels", 10, 6) is None
+    assert_image(await viz_tools.create_chart(query, chart_type=chart_type, x_column="label",
+                                              y_column="sessions", cache=False))
+
+@pytest.mark.parametrize("image_format", ["png", "jpeg"])
+async def test_create_heatmap(monkeypatch, image_format):
+    monkeypatch.setattr(Config, "HEATMAP_IMAGE_FORMAT", image_format)
+    result = await viz_tools.create_heatmap(
+        "SELECT country, page_1_main_category, price FROM clickstream",
+        x_column="page_1_main_category", y_column="country", value_column="price", cache=False)
+    assert_image(result, f"image/{image_format}")
+
+async def test_create_funnel_chart():
+    result = await viz_tools.create_funnel_chart(
+        "SELECT page AS stage, COUNT(DISTINCT session_id) AS count FROM clickstream GROUP BY page", cache=False)
+    assert_image(result)
+
+async def test_create_time_series():
+    # Dates arrive as text and are parsed by _parse_dates
+    result = await viz_tools.create_time_series(
+        "SELECT printf('%04d-%02d-%02d', year, month, day) AS date, page_1_main_category, COUNT(*) AS value "
+        "FROM clickstream GROUP BY 1, 2",
+        groupby_column="page_1_main_category", cache=False)
+    assert_image(result)
+
+async def test_chart_cache_hits_until_database_changes(tmp_path):
+    db_path = tmp_path / "ecommerce.db"
+    shutil.copy(Config.DATABASE_PATH, db_path)
+    tools = VisualizationTools()
+    tools.db_path = db_path
+    renders = []
+    render = tools._render
+    async def counting_render(draw):
+        renders.append(draw)
+        return await render(draw)
+    tools._render = counting_render
+    query = "SELECT country, COUNT(*) AS sessions FROM clickstream GROUP BY country"
+    try:
+        first = await tools.create_chart(query, title="Cache test")
+        assert_image(first)
+        second = await tools.create_chart(query, title="Cache test")
+        assert len(renders) == 1, "second identical request should be served from the chart cache"
+        assert second[1].data == first[1].data
+        
+        # Any write moves the database's mtime, which invalidates the cached chart
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("DELETE FROM clickstream WHERE country = 'Other'")
+        conn.close()
+        stat = os.stat(db_path)
+        os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        third = await tools.create_chart(query, title="Cache test")
+        assert len(renders) == 2, "chart should be re-rendered after the database changed"
+        assert third[1].data != first[1].data
+    finally:
+        tools.close()
+
+def test_query_cache_returns_independent_frames():
+    query = "SELECT country, COUNT(*) AS sessions FROM clickstream GROUP BY country"
+    first = viz_tools._execute_query(query)
+    expected = first.iloc[0, 1]
+    first.iloc[0, 1] = -999
+    assert viz_tools._execute_query(query).iloc[0, 1] == expected
+
+def test_downcast_keeps_integers_wide():
+    df = _downcast_numeric(pd.DataFrame({"clicks": np.full(4, 100), "price": [0.5, 1.25, np.nan, 2.0]}))
+    assert df["clicks"].dtype == np.int64
+    assert (-df["clicks"] * 1000).min() == -100_000, "narrowed integers would wrap around"
+    assert df["price"].dtype == np.float32
+
+@pytest.fixture
+def same_mtime_tools(tmp_path):
+    """Tools on two database copies with the same mtime, the second without the 'Other' rows"""
+    first_path, second_path = tmp_path / "first.db", tmp_path / "second.db"
+    shutil.copy2(Config.DATABASE_PATH, first_path)
+    shutil.copy2(Config.DATABASE_PATH, second_path)
+    conn = sqlite3.connect(second_path)
+    with conn:
+        conn.execute("DELETE FROM clickstream WHERE country = 'Other'")
+    conn.close()
+    stat = os.stat(first_path)
+    os.utime(second_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    
+    first, second = VisualizationTools(), VisualizationTools()
+    first.db_path, second.db_path = first_path, second_path
+    try:
+        yield first, second
+    finally:
+        for tools in (first, second):
+            tools.close()
+
+def test_query_cache_is_per_database(same_mtime_tools):
+    first, second = same_mtime_tools
+    query = "SELECT DISTINCT country FROM clickstream"
+    assert "Other" in set(first._execute_query(query)["country"])
+    assert "Other" not in set(second._execute_query(query)["country"])
+
+async def test_chart_cache_is_per_database(same_mtime_tools):
+    first, second = same_mtime_tools
+    query = "SELECT country, COUNT(*) AS sessions FROM clickstream GROUP BY country"
+    first_chart = assert_image(await first.create_chart(query, title="Per-database cache test"))
+    second_chart = assert_image(await second.create_chart(query, title="Per-database cache test"))
+    assert second_chart.data != first_chart.data
 
 if __name__ == "__main__":
-    success = asyncio.run(test_visualization_functionality())
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+    try:
+        asyncio.run(test_visualization_functionality())
+    except Exception:
+        sys.exit(1) 
\ No newline at end of file
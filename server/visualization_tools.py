@@ -5,61 +5,585 @@ This module provides MCP tools for creating various types of data visualizations
 including charts, heatmaps, and funnel diagrams.
 """
 
+import asyncio
 import base64
-import io
+import functools
+import hashlib
+import inspect
 import json
-from typing import Dict, List, Any, Optional, Tuple
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Charts are only ever rendered to image buffers
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib import font_manager
+from matplotlib.colors import to_rgb
+from matplotlib.ticker import MaxNLocator
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
 import seaborn as sns
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
+from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime, timedelta
+from pathlib import Path
 import sqlite3
+from cachetools import TTLCache
 from mcp.types import Tool
 from mcp.types import TextContent, ImageContent
 from config import Config
+from _numba_kernels import pivot_sum_count
 
 # Set matplotlib style for better-looking charts
 plt.style.use('default')
 sns.set_palette("husl")
+# Shared chart styling, set once here instead of passed on every call;
+# autolayout applies tight_layout to each figure when it is saved
+plt.rcParams.update({
+    'axes.titlesize': 14,
+    'axes.titleweight': 'bold',
+    'axes.titlepad': 20,
+    'grid.alpha': 0.3,
+    'figure.autolayout': True,
+})
 
+# Stage colors shared by both funnel renderers
+FUNNEL_COLORS = ["deepskyblue", "lightsalmon", "tan", "teal", "silver"]
+
+# zlib level for chart PNGs; below the default of 6, trading some payload
+# size for faster encoding
+PNG_COMPRESS_LEVEL = 3
+
+# Kaleido export is slow and blocking, so Plotly figures are exported in a
+# worker process. The pool is only created by the first Plotly export, since
+# the default renderers never need it. Spawned rather than forked, since
+# forking a process that has threads running is unsafe
+PLOTLY_EXPORT_WORKERS = 1
+_plotly_executor: Optional[ProcessPoolExecutor] = None
+_plotly_executor_lock = threading.Lock()
+
+def _get_plotly_executor() -> ProcessPoolExecutor:
+    """Return the Plotly export pool, creating it on first use."""
+    global _plotly_executor
+    with _plotly_executor_lock:
+        if _plotly_executor is None:
+            _plotly_executor = ProcessPoolExecutor(
+                max_workers=PLOTLY_EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _plotly_executor
+
+def shutdown_plotly_executor() -> None:
+    """Stop the Plotly export workers, if any were started."""
+    global _plotly_executor
+    with _plotly_executor_lock:
+        if _plotly_executor is not None:
+            _plotly_executor.shutdown(wait=True)
+            _plotly_executor = None
+
+def _export_plotly_png(fig: go.Figure) -> bytes:
+    """Export a Plotly figure to PNG bytes (runs in a worker process)."""
+    return fig.to_image(format="png", width=800, height=600, scale=2)
+
+# Quality for charts saved as JPEG (see Config.HEATMAP_IMAGE_FORMAT)
+JPEG_QUALITY = 85
+
+class _ByteList:
+    """Write-only file object that collects chunks and joins them once.
+    
+    Unlike io.BytesIO it never reallocates and copies its buffer as it grows.
+    """
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+    
+    def getvalue(self) -> bytes:
+        return b''.join(self.chunks)
+
+# Bar charts up to this many bars skip matplotlib and are drawn with PIL
+FAST_BAR_MAX_BARS = 40
+
+@functools.lru_cache(maxsize=None)
+def _pil_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    """Load matplotlib's default font for PIL, once per pixel size."""
+    path = font_manager.findfont(font_manager.FontProperties(weight='bold' if bold else 'normal'))
+    return ImageFont.truetype(path, size)
+
+def _text_mask(text: str, font: ImageFont.FreeTypeFont, angle: float) -> Image.Image:
+    """Render text as an alpha mask rotated counter-clockwise by angle degrees."""
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new('L', (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+    return mask.rotate(angle, resample=Image.BICUBIC, expand=True)
+
+def _fast_bar_png(xs, ys, title: str, width: float, height: float,
+                  x_label: str = "", y_label: str = "") -> Optional[bytes]:
+    """Draw a vertical bar chart straight to PNG bytes with PIL.
+    
+    Follows the matplotlib bar layout used by create_chart (value labels,
+    45-degree tick labels, boxed axes); for a handful of bars matplotlib's
+    fixed per-figure cost is most of the render time. Returns None when the
+    labels leave no room for the axes, for the caller to draw with matplotlib.
+    """
+    dpi = Config.CHART_DPI
+    px_per_pt = dpi / 72
+    font = _pil_font(round(plt.rcParams['font.size'] * px_per_pt))
+    title_font = _pil_font(round(plt.rcParams['axes.titlesize'] * px_per_pt), bold=True)
+    pad = round(3.5 * px_per_pt)
+    text_height = sum(font.getmetrics())
+    
+    img = Image.new('RGB', (round(width * dpi), round(height * dpi)), 'white')
+    draw = ImageDraw.Draw(img)
+    
+    # Value range with matplotlib's 5% margin; the zero baseline stays on the edge
+    raw = np.asarray(ys, dtype=np.float64)
+    values = np.nan_to_num(raw)
+    lo, hi = min(values.min(initial=0.0), 0.0), max(values.max(initial=0.0), 0.0)
+    span = (hi - lo) or 1.0
+    lo, hi = lo - 0.05 * span * (lo < 0), hi + 0.05 * span * (hi > 0 or lo == 0)
+    ticks = MaxNLocator(nbins=6, steps=[1, 2, 2.5, 5, 10]).tick_values(lo, hi)
+    ticks = ticks[(ticks >= lo - 1e-9 * span) & (ticks <= hi + 1e-9 * span)]
+    step = ticks[1] - ticks[0] if len(ticks) > 1 else 1.0
+    decimals = max(0, -int(np.floor(np.log10(step))))
+    tick_labels = [f"{tick:.{decimals}f}" for tick in ticks]
+    x_masks = [_text_mask(str(x), font, 45) for x in xs]
+    
+    # Margins around the axes box, sized to the labels drawn in them
+    top = pad + sum(title_font.getmetrics()) + round(plt.rcParams['axes.titlepad'] * px_per_pt)
+    bottom = img.height - (2 * pad + max((m.height for m in x_masks), default=0)
+                           + (text_height + pad if x_label else 0) + pad)
+    left = (pad + (text_height + pad if y_label else 0)
+            + max((round(font.getlength(label)) for label in tick_labels), default=0) + 2 * pad)
+    left = max(left, pad + (x_masks[0].width // 2 if x_masks else 0))
+    right = img.width - pad - (x_masks[-1].width // 2 if x_masks else 0)
+    if right <= left or bottom <= top:
+        return None
+    
+    # Bars sit at 0..n-1 with width 0.8, padded by the same 5% margin
+    n = len(x_masks)
+    centers = np.arange(n, dtype=np.float64)
+    x_lo, x_hi = -0.4 - 0.05 * (n - 0.2), n - 0.6 + 0.05 * (n - 0.2)
+    
+    def to_x(x):
+        return left + (x - x_lo) / (x_hi - x_lo) * (right - left)
+    
+    def to_y(y):
+        return bottom - (y - lo) / (hi - lo) * (bottom - top)
+    
+    bar_left, bar_right = to_x(centers - 0.4), to_x(centers + 0.4)
+    bar_top, bar_bottom = to_y(np.maximum(values, 0)), to_y(np.minimum(values, 0))
+    tick_x = to_x(centers)
+    
+    color = tuple(round(c * 255) for c in to_rgb(plt.rcParams['axes.prop_cycle'].by_key()['color'][0]))
+    for i in range(n):
+        if not np.isnan(raw[i]):
+            draw.rectangle([bar_left[i], bar_top[i], bar_right[i], bar_bottom[i]], fill=color)
+        draw.text((tick_x[i], to_y(values[i])), f'{raw[i]:.0f}', fill='black', font=font, anchor='md')
+        draw.line([(tick_x[i], bottom), (tick_x[i], bottom + pad)], fill='black')
+        img.paste((0, 0, 0), (round(tick_x[i] - x_masks[i].width / 2), bottom + 2 * pad), x_masks[i])
+    for tick, label in zip(ticks, tick_labels):
+        y = to_y(tick)
+        draw.line([(left - pad, y), (left, y)], fill='black')
+        draw.text((left - 2 * pad, y), label, fill='black', font=font, anchor='rm')
+    draw.rectangle([left, top, right, bottom], outline='black', width=max(1, round(0.8 * px_per_pt)))
+    
+    draw.text(((left + right) / 2, top - round(plt.rcParams['axes.titlepad'] * px_per_pt)), title,
+              fill='black', font=title_font, anchor='md')
+    if x_label:
+        draw.text(((left + right) / 2, img.height - pad), x_label, fill='black', font=font, anchor='md')
+    if y_label:
+        y_mask = _text_mask(y_label, font, 90)
+        img.paste((0, 0, 0), (pad, round((top + bottom - y_mask.height) / 2)), y_mask)
+    
+    buffer = _ByteList()
+    img.save(buffer, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+# Rendered results of the create_* tools, keyed by their query and chart arguments
+CHART_CACHE_SIZE = 128
+CHART_CACHE_TTL = 300  # seconds
+CHART_CACHE_MAX_BYTES = 4 * 1024 * 1024  # larger images are not worth holding
+_CHART_CACHE: TTLCache = TTLCache(maxsize=CHART_CACHE_SIZE, ttl=CHART_CACHE_TTL)
+
+def _cached_render(method):
+    """Cache a create_* method's output; pass cache=False to force a fresh render."""
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    async def wrapper(self, *args, cache: bool = True, **kwargs):
+        if not cache:
+            return await method(self, *args, **kwargs)
+        
+        # Bind against the signature so defaulted and explicit arguments share a key
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        chart_args = {name: value for name, value in bound.arguments.items() if name != "self"}
+        # Include the database and its mtime so charts go stale with the data, as the
+        # query cache does; the cache is module-wide, shared by every instance
+        db_path = Path(self.db_path).resolve()
+        try:
+            db_mtime = os.stat(db_path).st_mtime_ns
+        except OSError:
+            db_mtime = None
+        payload = f"{method.__name__}:{db_path}:{db_mtime}:" + json.dumps(chart_args, sort_keys=True, default=str)
+        key = hashlib.blake2b(payload.encode()).hexdigest()
+        
+        cached = _CHART_CACHE.get(key)
+        if cached is not None:
+            summary, img_str, mime_type = cached
+            return [TextContent(type="text", text=summary), ImageContent(type="image", data=img_str, mimeType=mime_type)]
+        
+        result = await method(self, *args, **kwargs)
+        
+        # Only successful renders (summary + image) are cached, never errors
+        if len(result) == 2 and isinstance(result[1], ImageContent) and len(result[1].data) <= CHART_CACHE_MAX_BYTES:
+            _CHART_CACHE[key] = (result[0].text, result[1].data, result[1].mimeType)
+        return result
+    
+    return wrapper
+
+
+# SQL equivalents of create_chart's pandas aggregations (SUM is coalesced
+# because pandas sums an all-null group to 0)
+SQL_AGGREGATES = {
+    "sum": "COALESCE(SUM({y}), 0)",
+    "avg": "AVG({y})",
+    "count": "COUNT(*)",
+    "max": "MAX({y})",
+    "min": "MIN({y})",
+}
+
+def _quote_identifier(name: str) -> str:
+    """Quote a column name for interpolation into SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+def _strip_statement(query: str) -> str:
+    """Drop a trailing semicolon so a query can be wrapped as a subquery."""
+    return query.strip().rstrip(';')
+
+def _dense_pivot(
+    df: pd.DataFrame,
+    y_column: str,
+    x_column: str,
+    value_column: Optional[str] = None,
+    aggregation: str = "sum"
+) -> pd.DataFrame:
+    """Pivot rows into a y-by-x grid of aggregated values (row counts if no value_column).
+    
+    Equivalent to groupby([y, x]).agg().unstack(fill_value=0), but accumulates
+    straight into a dense grid in one pass (see _numba_kernels).
+    """
+    yi, y_labels = pd.factorize(df[y_column], sort=True)
+    xi, x_labels = pd.factorize(df[x_column], sort=True)
+    
+    # groupby drops rows with a null key (code -1), along with any label
+    # that only appeared on such rows
+    has_keys = (yi >= 0) & (xi >= 0)
+    if not has_keys.all():
+        yi, xi = yi[has_keys], xi[has_keys]
+        y_used = np.bincount(yi, minlength=len(y_labels)) > 0
+        x_used = np.bincount(xi, minlength=len(x_labels)) > 0
+        yi, y_labels = (np.cumsum(y_used) - 1)[yi], y_labels[y_used]
+        xi, x_labels = (np.cumsum(x_used) - 1)[xi], x_labels[x_used]
+    
+    shape = (len(y_labels), len(x_labels))
+    if value_column is None:
+        values = np.ones(len(yi))
+    else:
+        values = df[value_column].to_numpy()
+        if not has_keys.all():
+            values = values[has_keys]
+    sums, counts = pivot_sum_count(yi, xi, values.astype(np.float64, copy=False), *shape)
+    
+    if value_column is None or aggregation == "count":
+        grid = counts
+    elif aggregation == "avg":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grid = sums / counts
+        # Cells with rows but only null values average to NaN; empty cells are 0
+        empty = counts == 0
+        if pd.isna(values).any():
+            _, rows = pivot_sum_count(yi, xi, np.ones(len(yi)), *shape)
+            empty = rows == 0
+        grid[empty] = 0
+    elif values.dtype.kind in "iu":
+        grid = sums.astype(np.int64)
+    else:
+        grid = sums
+    
+    return pd.DataFrame(
+        grid,
+        index=pd.Index(y_labels, name=y_column),
+        columns=pd.Index(x_labels, name=x_column)
+    )
+
+def _group_reduce(df: pd.DataFrame, x_column: str, y_column: str, aggregation: str) -> Optional[pd.DataFrame]:
+    """Aggregate y_column per x_column value, like df.groupby(x_column)[y_column].
+    
+    Factorizes the keys once and reduces with bincount-style kernels (see
+    _numba_kernels) instead of pandas' groupby machinery. Returns None when
+    pandas has to do it: an unknown aggregation, categorical keys, a
+    non-numeric y, or integers too large to round-trip through float64.
+    """
+    keys, column = df[x_column], df[y_column]
+    if (aggregation not in ("count", "sum", "avg", "max", "min")
+            or isinstance(keys.dtype, pd.CategoricalDtype)
+            or not pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column)):
+        return None
+    is_int = pd.api.types.is_integer_dtype(column)
+    values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    if is_int and len(values) and np.abs(values).max() * len(values) >= 2 ** 53:
+        return None
+    
+    # groupby sorts the keys and drops rows whose key is null (code -1)
+    codes, labels = pd.factorize(keys, sort=True)
+    if (codes < 0).any():
+        has_key = codes >= 0
+        codes, values = codes[has_key], values[has_key]
+    n = len(labels)
+    
+    if aggregation == "count":
+        result = np.bincount(codes, minlength=n)
+    elif aggregation in ("sum", "avg"):
+        sums, counts = pivot_sum_count(codes, np.zeros_like(codes), values, n, 1)
+        sums, counts = sums[:, 0], counts[:, 0]
+        if aggregation == "avg":
+            # Groups with only null values average to NaN, as in pandas
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = sums / counts
+        else:
+            result = sums.astype(np.int64) if is_int else sums
+    else:
+        # fmax/fmin skip NaN, so groups with only null values stay NaN
+        result = np.full(n, np.nan)
+        (np.fmax if aggregation == "max" else np.fmin).at(result, codes, values)
+        if is_int:
+            result = result.astype(np.int64)
+    
+    return pd.DataFrame({x_column: labels, y_column: result})
+
+def _parse_dates(column: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """Parse a date column, using the declared format when the values match it.
+    
+    An explicit format skips pandas' per-value format inference; values that
+    don't match it (e.g. full timestamps against '%Y-%m-%d') fall back to it.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    if date_format:
+        try:
+            return pd.to_datetime(column, format=date_format, cache=True)
+        except (TypeError, ValueError):
+            pass
+    return pd.to_datetime(column, cache=True)
+
+# Frames at least this long get their float columns narrowed; below it the
+# conversion costs more than the smaller columns save
+DOWNCAST_MIN_ROWS = 10_000
+
+def _downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """Narrow float64 columns to float32 where that holds their values exactly.
+    
+    Integer columns stay int64: negating or summing an int8/int16 column
+    later would wrap around silently instead of widening.
+    """
+    for column in df.select_dtypes('float').columns:
+        # to_numeric would round to float32 regardless; only narrow when nothing is lost
+        narrowed = df[column].astype(np.float32)
+        if np.array_equal(narrowed.to_numpy(np.float64), df[column].to_numpy(), equal_nan=True):
+            df[column] = narrowed
+    return df
+
+# Query results shared by all chart types, so one SQL string feeding several
+# renderers is only fetched and parsed once
+QUERY_CACHE_SIZE = 32
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # larger frames are re-read each time
+
+# Figures kept for reuse, one per (width, height), least recently used dropped first
+FIGURE_POOL_SIZE = 4
 
 class VisualizationTools:
     """Collection of visualization tools for the MCP server."""
     
+    _query_cache: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+    _query_cache_lock = threading.Lock()
+    
     def __init__(self):
         self.db_path = Config.DATABASE_PATH
+        self._local = threading.local()
+        # Charts are drawn and encoded off the event loop, on a single worker:
+        # matplotlib's font and text caches are not thread-safe, so drawing
+        # is serialized and only that thread ever touches the pooled figures
+        self._render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-render")
+        self._figures: "OrderedDict[Tuple[float, float], Figure]" = OrderedDict()
+    
+    def close(self) -> None:
+        """Stop the render worker, drop the pooled figures and close this thread's connection."""
+        self._render_pool.shutdown(wait=True)
+        self._figures.clear()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    async def _render(self, draw: Callable[[], str]) -> str:
+        """Run a draw-and-encode callable on the render worker and return its base64 image."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._render_pool, draw)
+    
+    def _get_fig(self, width: float, height: float) -> Tuple[Figure, Axes]:
+        """Return the pooled figure for this size, cleared, with fresh axes."""
+        fig = self._figures.get((width, height))
+        if fig is None:
+            # Built outside pyplot so it is never registered with (or closed by) its figure manager
+            fig = self._figures[(width, height)] = Figure(figsize=(width, height))
+            if len(self._figures) > FIGURE_POOL_SIZE:
+                self._figures.popitem(last=False)
+        else:
+            self._figures.move_to_end((width, height))
+        # Clear the whole figure, not just the axes, so extras like colorbars go too
+        fig.clear()
+        return fig, fig.add_subplot()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's long-lived connection, opening it on first use.
+        
+        Keeping it open lets SQLite hold hot pages across charts instead of
+        warming a fresh page cache on every query. The connection is
+        read-only for its whole lifetime, so nothing a query does persists.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Opened read-only: data_query is caller-supplied and never
+            # safety-checked, so it must not be able to modify the database
+            conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                   isolation_level=None)
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+            conn.execute("PRAGMA temp_store=MEMORY")
+            # mode=ro only covers the main file; this also refuses writes to
+            # any database a query ATTACHes
+            conn.execute("PRAGMA query_only=1")
+            self._local.conn = conn
+        return conn
+    
+    @classmethod
+    def clear_query_cache(cls) -> None:
+        """Drop all cached query results."""
+        with cls._query_cache_lock:
+            cls._query_cache.clear()
     
     def _execute_query(self, query: str, params: Optional[Tuple] = None) -> pd.DataFrame:
-        """Execute a database query and return results as DataFrame."""
+        """Execute a database query and return results as DataFrame.
+        
+        Results are cached per (database, query, params) until the database
+        file changes.
+        Callers get their own copy, so editing values in place never touches
+        the cached frame.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query(query, conn, params=params or ())
-            conn.close()
-            return df
+            # The cache is shared by every instance, so the key names the database as well
+            key = (Path(self.db_path).resolve(), os.stat(self.db_path).st_mtime_ns,
+                   query, tuple(params) if params else None)
+            with self._query_cache_lock:
+                df = self._query_cache.get(key)
+                if df is not None:
+                    self._query_cache.move_to_end(key)
+                    return df.copy()
+            
+            # Build the frame straight from the fetched tuples rather than
+            # through pandas' SQL layer
+            cursor = self._connection().execute(query, params or ())
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+            df = self._rows_to_frame(rows, columns)
+            if len(df) >= DOWNCAST_MIN_ROWS:
+                df = _downcast_numeric(df)
+            
+            if df.memory_usage(deep=True).sum() <= QUERY_CACHE_MAX_BYTES:
+                with self._query_cache_lock:
+                    self._query_cache[key] = df
+                    while len(self._query_cache) > QUERY_CACHE_SIZE:
+                        self._query_cache.popitem(last=False)
+            return df.copy()
         except Exception as e:
             raise Exception(f"Database query failed: {str(e)}")
     
-    def _fig_to_base64(self, fig) -> str:
-        """Convert matplotlib figure to base64 string."""
-        buffer = io.BytesIO()
-        fig.savefig(buffer, format='png', dpi=300, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none')
-        buffer.seek(0)
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        plt.close(fig)
+    @staticmethod
+    def _rows_to_frame(rows: List[Tuple[Any, ...]], columns: List[str]) -> pd.DataFrame:
+        """Build a DataFrame from fetched rows, typing single numeric columns directly."""
+        if len(columns) == 1 and rows:
+            values = [row[0] for row in rows]
+            value_types = set(map(type, values))
+            if value_types == {int}:
+                return pd.DataFrame({columns[0]: np.fromiter(values, dtype=np.int64, count=len(values))})
+            if value_types <= {int, float}:
+                return pd.DataFrame({columns[0]: np.fromiter(values, dtype=np.float64, count=len(values))})
+        return pd.DataFrame.from_records(rows, columns=columns)
+    
+    def _aggregate_in_sql(
+        self,
+        data_query: str,
+        x_column: str,
+        y_column: str,
+        aggregation: str,
+        limit: int,
+        top_values: bool
+    ) -> pd.DataFrame:
+        """Group, aggregate and limit a query in SQLite, matching create_chart's pandas path."""
+        x, y = _quote_identifier(x_column), _quote_identifier(y_column)
+        sql = (
+            f"SELECT {x}, {SQL_AGGREGATES[aggregation].format(y=y)} AS {y} "
+            # The subquery gets its own lines so a trailing -- comment can't swallow the ")"
+            f"FROM (\n{_strip_statement(data_query)}\n) WHERE {x} IS NOT NULL "
+            f"GROUP BY {x} ORDER BY {'2 DESC, 1' if top_values else '1'} LIMIT ?"
+        )
+        # Fetch one extra group to tell whether the limit cut anything off
+        df = self._execute_query(sql, (limit + 1,))
+        if len(df) > limit:
+            return df.head(limit)
+        # Under the limit, groups stay in x order as pandas' groupby leaves them
+        return df.sort_values(x_column, ignore_index=True) if top_values else df
+    
+    def _fig_to_base64(self, fig, dpi: int = None, fmt: str = 'png', quality: int = JPEG_QUALITY) -> str:
+        """Convert a pooled matplotlib figure to base64 string ('png' or 'jpeg')."""
+        if fmt == 'jpeg':
+            pil_kwargs = {'quality': quality, 'optimize': False}
+        else:
+            pil_kwargs = {'compress_level': PNG_COMPRESS_LEVEL}
+        buffer = _ByteList()
+        fig.savefig(buffer, format=fmt, dpi=dpi or Config.CHART_DPI, bbox_inches='tight', 
+                   facecolor='white', edgecolor='none',
+                   pil_kwargs=pil_kwargs)
+        img_str = base64.b64encode(buffer.getvalue()).decode('ascii')
         return img_str
     
-    def _plotly_to_base64(self, fig) -> str:
-        """Convert plotly figure to base64 string."""
-        img_bytes = fig.to_image(format="png", width=800, height=600, scale=2)
-        img_str = base64.b64encode(img_bytes).decode()
+    async def _plotly_to_base64(self, fig) -> str:
+        """Convert plotly figure to base64 string without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        img_bytes = await loop.run_in_executor(_get_plotly_executor(), _export_plotly_png, fig)
+        img_str = base64.b64encode(img_bytes).decode('ascii')
         return img_str
+    
+    def _image_content(self, img_str: str, mime_type: str = "image/png") -> ImageContent:
+        """Wrap an encoded image as MCP image content (base64 is required by the protocol)."""
+        return ImageContent(type="image", data=img_str, mimeType=mime_type)
 
+    @_cached_render
     async def create_chart(
         self,
         data_query: str,
@@ -89,99 +613,133 @@ class VisualizationTools:
             height: Chart height in inches
         """
         try:
-            # Execute query and get data
-            df = self._execute_query(data_query)
-            
-            if df.empty:
-                return [TextContent(type="text", text="No data found for the given query.")]
-            
-            # Auto-detect columns if not specified
-            numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-            categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+            # With explicit columns, aggregate in SQLite so only one row per
+            # group crosses into pandas; otherwise fall back to pandas below
+            df_agg = None
+            if x_column is not None and y_column is not None and aggregation in SQL_AGGREGATES:
+                try:
+                    # Probe a row where both columns are set: a NULL reads back as an
+                    # object column, which the full frame would not be
+                    probe = self._execute_query(
+                        f"SELECT * FROM (\n{_strip_statement(data_query)}\n) "
+                        f"WHERE {_quote_identifier(x_column)} IS NOT NULL "
+                        f"AND {_quote_identifier(y_column)} IS NOT NULL LIMIT 1")
+                    numeric_cols = probe.select_dtypes(include=[np.number]).columns.tolist()
+                    categorical_cols = probe.select_dtypes(include=['object', 'category']).columns.tolist()
+                    if x_column in categorical_cols and y_column in numeric_cols:
+                        df_agg = self._aggregate_in_sql(data_query, x_column, y_column, aggregation, limit,
+                                                        top_values=chart_type in ['bar', 'pie'])
+                except Exception:
+                    # Queries that can't be wrapped as a subquery run as written below
+                    df_agg = None
             
-            if x_column is None:
-                x_column = categorical_cols[0] if categorical_cols else df.columns[0]
-            if y_column is None:
-                y_column = numeric_cols[0] if numeric_cols else df.columns[1] if len(df.columns) > 1 else df.columns[0]
-            
-            # Apply aggregation if needed
-            if aggregation != "none" and x_column in categorical_cols and y_column in numeric_cols:
-                if aggregation == "count":
-                    df_agg = df.groupby(x_column).size().reset_index(name=y_column)
-                elif aggregation == "sum":
-                    df_agg = df.groupby(x_column)[y_column].sum().reset_index()
-                elif aggregation == "avg":
-                    df_agg = df.groupby(x_column)[y_column].mean().reset_index()
-                elif aggregation == "max":
-                    df_agg = df.groupby(x_column)[y_column].max().reset_index()
-                elif aggregation == "min":
-                    df_agg = df.groupby(x_column)[y_column].min().reset_index()
+            if df_agg is None:
+                # Execute query and get data
+                df = self._execute_query(data_query)
+                
+                if df.empty:
+                    return [TextContent(type="text", text="No data found for the given query.")]
+                
+                # Auto-detect columns if not specified
+                numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+                categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+                
+                if x_column is None:
+                    x_column = categorical_cols[0] if categorical_cols else df.columns[0]
+                if y_column is None:
+                    y_column = numeric_cols[0] if numeric_cols else df.columns[1] if len(df.columns) > 1 else df.columns[0]
+                
+                # Apply aggregation if needed
+                if aggregation != "none" and x_column in categorical_cols and y_column in numeric_cols:
+                    df_agg = _group_reduce(df, x_column, y_column, aggregation)
+                    if df_agg is None:
+                        if aggregation == "count":
+                            df_agg = df.groupby(x_column).size().reset_index(name=y_column)
+                        elif aggregation == "sum":
+                            df_agg = df.groupby(x_column)[y_column].sum().reset_index()
+                        elif aggregation == "avg":
+                            df_agg = df.groupby(x_column)[y_column].mean().reset_index()
+                        elif aggregation == "max":
+                            df_agg = df.groupby(x_column)[y_column].max().reset_index()
+                        elif aggregation == "min":
+                            df_agg = df.groupby(x_column)[y_column].min().reset_index()
+                        else:
+                            df_agg = df
                 else:
                     df_agg = df
-            else:
-                df_agg = df
-            
-            # Apply limit
-            if len(df_agg) > limit:
-                if chart_type in ['bar', 'pie'] and y_column in numeric_cols:
-                    df_agg = df_agg.sort_values(y_column, ascending=False).head(limit)
-                else:
-                    df_agg = df_agg.head(limit)
+                
+                # Apply limit
+                if len(df_agg) > limit:
+                    if chart_type in ['bar', 'pie'] and y_column in numeric_cols:
+                        df_agg = df_agg.sort_values(y_column, ascending=False).head(limit)
+                    else:
+                        df_agg = df_agg.head(limit)
             
-            # Create chart based on type
-            fig, ax = plt.subplots(figsize=(width, height))
+            if chart_type == "scatter" and len(numeric_cols) < 2:
+                return [TextContent(type="text", text="Scatter plot requires at least 2 numeric columns.")]
             
-            if chart_type == "bar":
-                bars = ax.bar(df_agg[x_column], df_agg[y_column])
-                ax.set_xlabel(x_column.replace('_', ' ').title())
-                ax.set_ylabel(y_column.replace('_', ' ').title())
-                ax.tick_params(axis='x', rotation=45)
+            def render() -> str:
+                if (chart_type == "bar" and color_column is None and len(df_agg) <= FAST_BAR_MAX_BARS
+                        and pd.api.types.is_numeric_dtype(df_agg[y_column])):
+                    png = _fast_bar_png(df_agg[x_column], df_agg[y_column], title, width, height,
+                                        x_column.replace('_', ' ').title(), y_column.replace('_', ' ').title())
+                    # None means the labels don't fit; matplotlib's layout copes with them below
+                    if png is not None:
+                        return base64.b64encode(png).decode('ascii')
                 
-                # Add value labels on bars
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2., height,
-                           f'{height:.0f}', ha='center', va='bottom')
-            
-            elif chart_type == "line":
-                ax.plot(df_agg[x_column], df_agg[y_column], marker='o', linewidth=2, markersize=6)
-                ax.set_xlabel(x_column.replace('_', ' ').title())
-                ax.set_ylabel(y_column.replace('_', ' ').title())
-                ax.tick_params(axis='x', rotation=45)
-                ax.grid(True, alpha=0.3)
-            
-            elif chart_type == "pie":
-                wedges, texts, autotexts = ax.pie(df_agg[y_column], labels=df_agg[x_column], 
-                                                 autopct='%1.1f%%', startangle=90)
-                ax.axis('equal')
+                # Create chart based on type
+                fig, ax = self._get_fig(width, height)
                 
-                # Improve text readability
-                for autotext in autotexts:
-                    autotext.set_color('white')
-                    autotext.set_fontweight('bold')
-            
-            elif chart_type == "scatter":
-                if len(numeric_cols) >= 2:
+                if chart_type == "bar":
+                    bars = ax.bar(df_agg[x_column], df_agg[y_column])
+                    ax.set_xlabel(x_column.replace('_', ' ').title())
+                    ax.set_ylabel(y_column.replace('_', ' ').title())
+                    ax.tick_params(axis='x', rotation=45)
+                    
+                    # Add value labels on bars
+                    for bar in bars:
+                        bar_height = bar.get_height()
+                        ax.text(bar.get_x() + bar.get_width()/2., bar_height,
+                               f'{bar_height:.0f}', ha='center', va='bottom')
+                
+                elif chart_type == "line":
+                    ax.plot(df_agg[x_column], df_agg[y_column], marker='o', linewidth=2, markersize=6)
+                    ax.set_xlabel(x_column.replace('_', ' ').title())
+                    ax.set_ylabel(y_column.replace('_', ' ').title())
+                    ax.tick_params(axis='x', rotation=45)
+                    ax.grid(True)
+                
+                elif chart_type == "pie":
+                    wedges, texts, autotexts = ax.pie(df_agg[y_column], labels=df_agg[x_column], 
+                                                     autopct='%1.1f%%', startangle=90)
+                    ax.axis('equal')
+                    
+                    # Improve text readability
+                    for autotext in autotexts:
+                        autotext.set_color('white')
+                        autotext.set_fontweight('bold')
+                
+                elif chart_type == "scatter":
                     scatter = ax.scatter(df_agg[x_column], df_agg[y_column], 
                                        alpha=0.7, s=60, edgecolors='black', linewidth=0.5)
                     ax.set_xlabel(x_column.replace('_', ' ').title())
                     ax.set_ylabel(y_column.replace('_', ' ').title())
-                    ax.grid(True, alpha=0.3)
-                else:
-                    return [TextContent(type="text", text="Scatter plot requires at least 2 numeric columns.")]
-            
-            elif chart_type == "histogram":
-                ax.hist(df_agg[y_column], bins=min(30, len(df_agg)//2), 
-                       alpha=0.7, edgecolor='black', linewidth=0.5)
-                ax.set_xlabel(y_column.replace('_', ' ').title())
-                ax.set_ylabel('Frequency')
-                ax.grid(True, alpha=0.3)
-            
-            ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-            plt.tight_layout()
+                    ax.grid(True)
+                
+                elif chart_type == "histogram":
+                    ax.hist(df_agg[y_column], bins=min(30, len(df_agg)//2), 
+                           alpha=0.7, edgecolor='black', linewidth=0.5)
+                    ax.set_xlabel(y_column.replace('_', ' ').title())
+                    ax.set_ylabel('Frequency')
+                    ax.grid(True)
+                
+                ax.set_title(title)
+                
+                # Convert to base64
+                return self._fig_to_base64(fig)
             
-            # Convert to base64
-            img_str = self._fig_to_base64(fig)
+            # Draw and encode on a render thread
+            img_str = await self._render(render)
             
             # Create summary text
             summary = f"""Chart created successfully:
@@ -193,12 +751,13 @@ class VisualizationTools:
             
             return [
                 TextContent(type="text", text=summary),
-                ImageContent(type="image", data=img_str, mimeType="image/png")
+                self._image_content(img_str)
             ]
             
         except Exception as e:
             return [TextContent(type="text", text=f"Error creating chart: {str(e)}")]
 
+    @_cached_render
     async def create_heatmap(
         self,
         data_query: str,
@@ -242,34 +801,29 @@ class VisualizationTools:
             if value_column is None:
                 value_column = numeric_cols[0] if numeric_cols else 'count'
             
-            # Create pivot table
+            # Create pivot table (row counts when value_column is 'count')
             if value_column == 'count':
-                pivot_df = df.groupby([y_column, x_column]).size().unstack(fill_value=0)
+                pivot_df = _dense_pivot(df, y_column, x_column)
             else:
-                if aggregation == "sum":
-                    pivot_df = df.groupby([y_column, x_column])[value_column].sum().unstack(fill_value=0)
-                elif aggregation == "avg":
-                    pivot_df = df.groupby([y_column, x_column])[value_column].mean().unstack(fill_value=0)
-                elif aggregation == "count":
-                    pivot_df = df.groupby([y_column, x_column])[value_column].count().unstack(fill_value=0)
-                else:
-                    pivot_df = df.groupby([y_column, x_column])[value_column].sum().unstack(fill_value=0)
+                pivot_df = _dense_pivot(df, y_column, x_column, value_column,
+                                        aggregation if aggregation in ("avg", "count") else "sum")
             
-            # Create heatmap
-            fig, ax = plt.subplots(figsize=(width, height))
-            
-            heatmap = sns.heatmap(pivot_df, annot=True, fmt='.0f', cmap=colormap, 
-                                 cbar_kws={'label': value_column.replace('_', ' ').title()},
-                                 ax=ax, linewidths=0.5)
-            
-            ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-            ax.set_xlabel(x_column.replace('_', ' ').title())
-            ax.set_ylabel(y_column.replace('_', ' ').title())
-            
-            plt.tight_layout()
+            def render() -> str:
+                # Create heatmap
+                fig, ax = self._get_fig(width, height)
+                
+                heatmap = sns.heatmap(pivot_df, annot=True, fmt='.0f', cmap=colormap, 
+                                     cbar_kws={'label': value_column.replace('_', ' ').title()},
+                                     ax=ax, linewidths=0.5)
+                
+                ax.set_title(title)
+                ax.set_xlabel(x_column.replace('_', ' ').title())
+                ax.set_ylabel(y_column.replace('_', ' ').title())
+                
+                # Convert to base64
+                return self._fig_to_base64(fig, fmt=Config.HEATMAP_IMAGE_FORMAT)
             
-            # Convert to base64
-            img_str = self._fig_to_base64(fig)
+            img_str = await self._render(render)
             
             summary = f"""Heatmap created successfully:
             - Dimensions: {pivot_df.shape[0]} x {pivot_df.shape[1]}
@@ -280,12 +834,76 @@ class VisualizationTools:
                         
             return [
                 TextContent(type="text", text=summary),
-                ImageContent(type="image", data=img_str, mimeType="image/png")
+                self._image_content(img_str, mime_type=f"image/{Config.HEATMAP_IMAGE_FORMAT}")
             ]
             
         except Exception as e:
             return [TextContent(type="text", text=f"Error creating heatmap: {str(e)}")]
 
+    async def _render_funnel_plotly(self, stages: List[Any], values: List[Any], title: str, width: int, height: int) -> str:
+        """Render a funnel with Plotly (exported through Kaleido) and return it as base64."""
+        fig = go.Figure(go.Funnel(
+            y=stages,
+            x=values,
+            textinfo="value+percent initial",
+            texttemplate='%{label}<br>%{value:,}<br>(%{percentInitial})',
+            textfont=dict(size=12),
+            connector={"line": {"color": "royalblue", "dash": "dot", "width": 3}},
+            marker={"color": FUNNEL_COLORS,
+                   "line": {"color": ["wheat", "wheat", "wheat", "wheat", "wheat"], "width": 2}}
+        ))
+        
+        fig.update_layout(
+            title={
+                'text': title,
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'size': 16, 'family': 'Arial, sans-serif'}
+            },
+            font=dict(size=12),
+            width=width * 80,
+            height=height * 80,
+            margin=dict(l=50, r=50, t=80, b=50)
+        )
+        
+        return await self._plotly_to_base64(fig)
+    
+    def _render_funnel_matplotlib(self, stages: List[Any], values: List[Any], title: str, width: int, height: int) -> str:
+        """Render a funnel in-process with matplotlib and return it as base64.
+        
+        Mirrors the Plotly layout: centered bars sized by value, first stage on
+        top, joined by shaded connectors.
+        """
+        widths = np.asarray(values, dtype=float)
+        positions = np.arange(len(stages))[::-1]
+        colors = [FUNNEL_COLORS[i % len(FUNNEL_COLORS)] for i in range(len(stages))]
+        bar_height = 0.6
+        
+        fig, ax = self._get_fig(width, height)
+        
+        ax.barh(positions, widths, left=-widths / 2, height=bar_height,
+                color=colors, edgecolor='wheat', linewidth=2)
+        
+        # Connectors from the bottom edge of each stage to the top of the next
+        for i in range(len(stages) - 1):
+            top = positions[i] - bar_height / 2
+            bottom = positions[i + 1] + bar_height / 2
+            ax.fill([-widths[i] / 2, widths[i] / 2, widths[i + 1] / 2, -widths[i + 1] / 2],
+                    [top, top, bottom, bottom], color='royalblue', alpha=0.15, linewidth=0)
+        
+        for position, stage, value in zip(positions, stages, values):
+            share = f"\n({value / values[0]:.1%})" if values[0] else ""
+            ax.text(0, position, f"{stage}\n{value:,}{share}", ha='center', va='center', fontsize=10)
+        
+        ax.set_title(title)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        
+        return self._fig_to_base64(fig)
+    
+    @_cached_render
     async def create_funnel_chart(
         self,
         stages_query: str,
@@ -312,60 +930,34 @@ class VisualizationTools:
             if df.empty:
                 return [TextContent(type="text", text="No data found for the given query.")]
             
-            # Sort by value descending (typical funnel order)
-            df = df.sort_values(value_column, ascending=False)
-            
-            stages = df[stage_column].tolist()
-            values = df[value_column].tolist()
+            # Sort by value descending (typical funnel order); funnels are a
+            # handful of rows, so sort the raw arrays rather than the frame
+            values = df[value_column].to_numpy()
+            order = np.argsort(-values, kind='stable')
+            stages = df[stage_column].to_numpy()[order].tolist()
+            values = values[order]
             
             # Calculate conversion rates
-            conversion_rates = []
-            for i, value in enumerate(values):
-                if i == 0:
-                    conversion_rates.append(100.0)
-                else:
-                    rate = (value / values[0]) * 100
-                    conversion_rates.append(rate)
-            
-            # Create funnel using Plotly for better funnel visualization
-            fig = go.Figure(go.Funnel(
-                y=stages,
-                x=values,
-                textinfo="value+percent initial",
-                texttemplate='%{label}<br>%{value:,}<br>(%{percentInitial})',
-                textfont=dict(size=12),
-                connector={"line": {"color": "royalblue", "dash": "dot", "width": 3}},
-                marker={"color": ["deepskyblue", "lightsalmon", "tan", "teal", "silver"],
-                       "line": {"color": ["wheat", "wheat", "wheat", "wheat", "wheat"], "width": 2}}
-            ))
-            
-            fig.update_layout(
-                title={
-                    'text': title,
-                    'x': 0.5,
-                    'xanchor': 'center',
-                    'font': {'size': 16, 'family': 'Arial, sans-serif'}
-                },
-                font=dict(size=12),
-                width=width * 80,
-                height=height * 80,
-                margin=dict(l=50, r=50, t=80, b=50)
-            )
+            # Guarded like the drop-off rates below, so an empty top stage gives 0% rather than NaN
+            top = values[0] if values[0] > 0 else 1
+            conversion_rates = np.where(values[0] > 0, values / top * 100, 0.0)
+            conversion_rates[0] = 100.0
             
             # Convert to base64
-            img_str = self._plotly_to_base64(fig)
+            if Config.FUNNEL_RENDERER == "plotly":
+                img_str = await self._render_funnel_plotly(stages, values, title, width, height)
+            else:
+                img_str = await self._render(functools.partial(
+                    self._render_funnel_matplotlib, stages, values, title, width, height))
             
             # Calculate drop-off rates
-            dropoff_analysis = []
-            for i in range(len(stages) - 1):
-                current_stage = stages[i]
-                next_stage = stages[i + 1]
-                current_value = values[i]
-                next_value = values[i + 1]
-                dropoff = current_value - next_value
-                dropoff_rate = (dropoff / current_value) * 100 if current_value > 0 else 0
-                
-                dropoff_analysis.append(f"• {current_stage} → {next_stage}: {dropoff:,} users dropped ({dropoff_rate:.1f}%)")
+            dropoffs = values[:-1] - values[1:]
+            dropoff_rates = np.where(values[:-1] > 0, dropoffs / np.where(values[:-1] > 0, values[:-1], 1) * 100, 0)
+            dropoff_analysis = [
+                f"• {current_stage} → {next_stage}: {dropoff:,} users dropped ({dropoff_rate:.1f}%)"
+                for current_stage, next_stage, dropoff, dropoff_rate
+                in zip(stages, stages[1:], dropoffs.tolist(), dropoff_rates.tolist())
+            ]
             
             summary = f"""Funnel chart created successfully:
 
@@ -379,16 +971,17 @@ class VisualizationTools:
             {chr(10).join(dropoff_analysis)}
 
             **Conversion rates by stage:**
-            {chr(10).join([f"• {stage}: {rate:.1f}%" for stage, rate in zip(stages, conversion_rates)])}"""
+            {chr(10).join([f"• {stage}: {rate:.1f}%" for stage, rate in zip(stages, conversion_rates.tolist())])}"""
             
             return [
                 TextContent(type="text", text=summary),
-                ImageContent(type="image", data=img_str, mimeType="image/png")
+                self._image_content(img_str)
             ]
             
         except Exception as e:
             return [TextContent(type="text", text=f"Error creating funnel chart: {str(e)}")]
 
+    @_cached_render
     async def create_time_series(
         self,
         data_query: str,
@@ -420,37 +1013,37 @@ class VisualizationTools:
                 return [TextContent(type="text", text="No data found for the given query.")]
             
             # Convert date column to datetime
-            df[date_column] = pd.to_datetime(df[date_column])
+            df[date_column] = _parse_dates(df[date_column], date_format)
             df = df.sort_values(date_column)
             
-            fig, ax = plt.subplots(figsize=(width, height))
-            
-            if groupby_column and groupby_column in df.columns:
-                # Multiple series
-                for group in df[groupby_column].unique():
-                    group_data = df[df[groupby_column] == group]
-                    ax.plot(group_data[date_column], group_data[value_column], 
-                           marker='o', label=str(group), linewidth=2, markersize=4)
-                ax.legend(title=groupby_column.replace('_', ' ').title())
-            else:
-                # Single series
-                ax.plot(df[date_column], df[value_column], 
-                       marker='o', linewidth=2, markersize=4, color='steelblue')
-            
-            ax.set_xlabel('Date')
-            ax.set_ylabel(value_column.replace('_', ' ').title())
-            ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-            ax.grid(True, alpha=0.3)
-            
-            # Format x-axis dates
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-            ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=1))
-            plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-            
-            plt.tight_layout()
+            def render() -> str:
+                fig, ax = self._get_fig(width, height)
+                
+                if groupby_column and groupby_column in df.columns:
+                    # Multiple series, split in one groupby pass (first-seen order)
+                    for group, group_data in df.groupby(groupby_column, sort=False):
+                        ax.plot(group_data[date_column], group_data[value_column], 
+                               marker='o', label=str(group), linewidth=2, markersize=4)
+                    ax.legend(title=groupby_column.replace('_', ' ').title())
+                else:
+                    # Single series
+                    ax.plot(df[date_column], df[value_column], 
+                           marker='o', linewidth=2, markersize=4, color='steelblue')
+                
+                ax.set_xlabel('Date')
+                ax.set_ylabel(value_column.replace('_', ' ').title())
+                ax.set_title(title)
+                ax.grid(True)
+                
+                # Format x-axis dates
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+                ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=1))
+                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
+                
+                # Convert to base64
+                return self._fig_to_base64(fig)
             
-            # Convert to base64
-            img_str = self._fig_to_base64(fig)
+            img_str = await self._render(render)
             
             # Calculate basic statistics
             date_range = f"{df[date_column].min().strftime('%Y-%m-%d')} to {df[date_column].max().strftime('%Y-%m-%d')}"
@@ -465,7 +1058,7 @@ class VisualizationTools:
             
             return [
                 TextContent(type="text", text=summary),
-                ImageContent(type="image", data=img_str, mimeType="image/png")
+                self._image_content(img_str)
             ]
             
         except Exception as e:
@@ -473,8 +1066,8 @@ class VisualizationTools:
 
 
 # MCP Tool Definitions
-def get_visualization_tools() -> List[Tool]:
-    """Return list of visualization tools for MCP server."""
+def _build_visualization_tools() -> List[Tool]:
+    """Build the visualization tool definitions (called once at import)."""
     
     return [
         Tool(
@@ -628,4 +1221,11 @@ def get_visualization_tools() -> List[Tool]:
                 "required": ["data_query"]
             }
         )
-    ] 
\ No newline at end of file
+    ]
+
+
+VISUALIZATION_TOOLS = _build_visualization_tools()
+
+def get_visualization_tools() -> List[Tool]:
+    """Return list of visualization tools for MCP server."""
+    return VISUALIZATION_TOOLS
\ No newline at end of file